@@ -4,6 +4,8 @@
  * Includes memory management to prevent memory leaks
  */
 
+const fs = require('fs');
+const path = require('path');
 const puppeteer = require('puppeteer-extra');
 const StealthPlugin = require('puppeteer-extra-plugin-stealth');
 
@@ -16,6 +18,23 @@ const MAX_REQUESTS = 50; // Restart browser after N requests
 const MAX_MEMORY_MB = 500; // Restart browser if memory exceeds this (MB)
 const MEMORY_CHECK_INTERVAL = 30 * 1000; // Check memory every 30 seconds
 
+// Optional persistent profile (set by the launcher): HTTP cache, service workers
+// and cookies survive browser recycles and server restarts
+const PROFILE_DIR = process.env.BROWSER_PROFILE_DIR || null;
+const PROFILE_MAX_MB = parseInt(process.env.BROWSER_PROFILE_MAX_MB) || 512;
+const PROFILE_STATE_FILE = 'profile-state.json'; // Our own bookkeeping inside the profile
+const PROFILE_LOCK_WAIT_MS = 10 * 1000; // How long to wait for a leftover Chrome to release the profile
+// Cache folders that are safe to delete while the browser is closed
+const PROFILE_CACHE_DIRS = [
+    'Default/Cache',
+    'Default/Code Cache',
+    'Default/GPUCache',
+    'Default/Service Worker/CacheStorage',
+    'Default/Service Worker/ScriptCache',
+    'GrShaderCache',
+    'ShaderCache'
+];
+
 class BrowserManager {
     constructor() {
         this.browser = null;
@@ -27,6 +46,13 @@ class BrowserManager {
         this.memoryCheckTimer = null;
         this.peakMemoryMB = 0;
         this.restartCount = 0;
+        this.maxPages = MAX_PAGES;
+        this.maxMemoryMB = MAX_MEMORY_MB;
+        this.profileDir = PROFILE_DIR;
+        this.profileResets = 0;
+        this.profileSizeMB = null; // Last background measurement
+        this.profileTrim = null; // 'caches' or 'reset', applied before the next launch
+        this.measuringProfile = false;
     }
 
     /**
@@ -94,8 +120,8 @@ class BrowserManager {
             }
 
             // Force restart if memory too high
-            if (rssMB > MAX_MEMORY_MB) {
-                console.log(`⚠️ Memory usage high: ${rssMB}MB > ${MAX_MEMORY_MB}MB - restarting browser`);
+            if (rssMB > this.maxMemoryMB) {
+                console.log(`⚠️ Memory usage high: ${rssMB}MB > ${this.maxMemoryMB}MB - restarting browser`);
                 this.restartCount++;
                 await this.closeBrowser();
             }
@@ -106,9 +132,86 @@ class BrowserManager {
 
     /**
      * Launch new browser instance
+     * With a persistent profile, a failed launch is retried once: after waiting
+     * for a leftover Chrome to release the profile, or with the profile moved
+     * aside if nothing holds it (corrupted profile).
      */
     async launchBrowser() {
-        return puppeteer.launch({
+        if (!this.profileDir) {
+            return puppeteer.launch(this.launchOptions());
+        }
+
+        await this.trimProfile();
+        let browser;
+        try {
+            browser = await puppeteer.launch(this.launchOptions(this.profileDir));
+        } catch (error) {
+            if (this.profileInUse()) {
+                // Never wipe a profile another Chrome still holds (it has our cookies)
+                console.log('⚠️ Browser profile is still in use - waiting for the other Chrome to exit');
+                if (!await this.waitForProfileRelease()) {
+                    throw new Error(`Browser profile is in use by another Chrome process: ${this.profileDir}`);
+                }
+            } else {
+                console.log(`⚠️ Browser failed to start with profile (${error.message}) - resetting profile`);
+                await this.resetProfile();
+            }
+            browser = await puppeteer.launch(this.launchOptions(this.profileDir));
+        }
+
+        this.measureProfile();
+        return browser;
+    }
+
+    /**
+     * Check if a running Chrome holds the profile lock
+     * Windows: Chrome keeps `lockfile` open, so it cannot be deleted while in use.
+     * Elsewhere: `SingletonLock` is a symlink to "<hostname>-<pid>".
+     */
+    profileInUse() {
+        if (process.platform === 'win32') {
+            try {
+                fs.rmSync(path.join(this.profileDir, 'lockfile'), { force: true });
+                return false;
+            } catch (e) {
+                return true;
+            }
+        }
+
+        let target;
+        try {
+            target = fs.readlinkSync(path.join(this.profileDir, 'SingletonLock'));
+        } catch (e) {
+            return false; // No lock
+        }
+        const pid = parseInt(target.split('-').pop());
+        if (!pid) return false;
+        try {
+            process.kill(pid, 0);
+            return true;
+        } catch (e) {
+            return e.code === 'EPERM'; // Alive but owned by someone else
+        }
+    }
+
+    /**
+     * Wait until the profile lock is released
+     * @returns {boolean} true if the profile became free
+     */
+    async waitForProfileRelease() {
+        const deadline = Date.now() + PROFILE_LOCK_WAIT_MS;
+        while (Date.now() < deadline) {
+            await new Promise(resolve => setTimeout(resolve, 500));
+            if (!this.profileInUse()) return true;
+        }
+        return false;
+    }
+
+    /**
+     * Puppeteer launch options (optionally with a user data dir)
+     */
+    launchOptions(userDataDir = null) {
+        const options = {
             headless: HEADLESS,  // Puppeteer v24 uses boolean
             args: [
                 '--no-sandbox',
@@ -127,13 +230,150 @@ class BrowserManager {
             ],
             defaultViewport: { width: 1280, height: 720 },
             protocolTimeout: 60000  // Increase timeout for slow connections
+        };
+
+        if (userDataDir) {
+            options.userDataDir = userDataDir;
+            // Keep Chrome's own HTTP cache within half of the profile budget
+            options.args.push(`--disk-cache-size=${Math.floor(PROFILE_MAX_MB / 2) * 1024 * 1024}`);
+        }
+
+        return options;
+    }
+
+    /**
+     * Total size of a directory in bytes
+     */
+    async dirSize(dir) {
+        let total = 0;
+        let entries;
+        try {
+            entries = await fs.promises.readdir(dir, { withFileTypes: true });
+        } catch (e) {
+            return 0;
+        }
+
+        for (const entry of entries) {
+            const entryPath = path.join(dir, entry.name);
+            if (entry.isDirectory()) {
+                total += await this.dirSize(entryPath);
+            } else if (entry.isFile()) {
+                try {
+                    total += (await fs.promises.stat(entryPath)).size;
+                } catch (e) {
+                    // File removed while scanning
+                }
+            }
+        }
+        return total;
+    }
+
+    /**
+     * Measure the profile in the background after a launch, so the launch path
+     * never walks the profile tree. Oversized profiles are trimmed on the next launch.
+     */
+    measureProfile() {
+        if (this.measuringProfile) return;
+        this.measuringProfile = true;
+
+        (async () => {
+            const maxBytes = PROFILE_MAX_MB * 1024 * 1024;
+            const size = await this.dirSize(this.profileDir);
+            let cacheSize = 0;
+            for (const cacheDir of PROFILE_CACHE_DIRS) {
+                cacheSize += await this.dirSize(path.join(this.profileDir, cacheDir));
+            }
+
+            this.profileSizeMB = Math.round(size / 1024 / 1024);
+            if (size <= maxBytes) {
+                this.profileTrim = null;
+            } else {
+                this.profileTrim = size - cacheSize > maxBytes ? 'reset' : 'caches';
+            }
+        })().catch(e => {
+            console.error('Profile size check error:', e.message);
+        }).finally(() => {
+            this.measuringProfile = false;
         });
     }
 
+    /**
+     * Apply a trim found by the last measurement (browser must be closed)
+     * Caches go first; if that is not enough the profile is reset.
+     */
+    async trimProfile() {
+        const trim = this.profileTrim;
+        if (!trim || this.profileInUse()) return;
+        this.profileTrim = null;
+
+        if (trim === 'reset') {
+            console.log(`🧹 Browser profile ${this.profileSizeMB}MB > ${PROFILE_MAX_MB}MB even without caches - resetting`);
+            await this.resetProfile();
+            return;
+        }
+
+        console.log(`🧹 Browser profile ${this.profileSizeMB}MB > ${PROFILE_MAX_MB}MB - clearing caches`);
+        for (const cacheDir of PROFILE_CACHE_DIRS) {
+            await fs.promises.rm(path.join(this.profileDir, cacheDir), { recursive: true, force: true });
+        }
+    }
+
+    /**
+     * Replace the profile with an empty one (previous one kept as .broken until next reset)
+     * The profile is only moved, never deleted, so a failed move leaves it intact.
+     */
+    async resetProfile() {
+        const broken = `${this.profileDir}.broken`;
+        try {
+            await fs.promises.rm(broken, { recursive: true, force: true });
+            if (fs.existsSync(this.profileDir)) {
+                await fs.promises.rename(this.profileDir, broken);
+            }
+            this.profileResets++;
+        } catch (e) {
+            console.error('Browser profile reset error:', e.message);
+        }
+        await fs.promises.mkdir(this.profileDir, { recursive: true });
+    }
+
+    /**
+     * Read a value from the profile's bookkeeping file
+     */
+    getProfileState(key) {
+        if (!this.profileDir) return undefined;
+        try {
+            const state = JSON.parse(fs.readFileSync(path.join(this.profileDir, PROFILE_STATE_FILE), 'utf-8'));
+            return state[key];
+        } catch (e) {
+            return undefined;
+        }
+    }
+
+    /**
+     * Store a value in the profile's bookkeeping file
+     */
+    setProfileState(key, value) {
+        if (!this.profileDir) return;
+        const statePath = path.join(this.profileDir, PROFILE_STATE_FILE);
+        let state = {};
+        try {
+            state = JSON.parse(fs.readFileSync(statePath, 'utf-8'));
+        } catch (e) {
+            // First write or unreadable - start over
+        }
+        state[key] = value;
+        try {
+            fs.writeFileSync(statePath, JSON.stringify(state));
+        } catch (e) {
+            console.error('Profile state write error:', e.message);
+        }
+    }
+
     /**
      * Get a new page from the browser pool
+     * @param {BrowserContext} context - Isolated context to open the page in (optional)
      */
-    async getPage() {
+    async getPage(context = null) {
         const browser = await this.getBrowser();
 
         // Check if we need to restart browser (memory management)
@@ -146,7 +386,7 @@ class BrowserManager {
 
         // Check current page count
         const pages = await browser.pages();
-        if (pages.length >= MAX_PAGES) {
+        if (pages.length >= this.maxPages) {
             // Close oldest page (skip first which is usually blank)
             const oldestPage = pages[1];
             if (oldestPage) {
@@ -154,7 +394,7 @@ class BrowserManager {
             }
         }
 
-        const page = await browser.newPage();
+        const page = await (context || browser).newPage();
 
         // Set up page defaults
         await page.setUserAgent(
@@ -225,6 +465,15 @@ class BrowserManager {
         this.requestCount = 0;
     }
 
+    /**
+     * Apply new limits at runtime (values are validated by the admin API)
+     * Lower limits take effect on the next getPage() / memory check.
+     */
+    configure({ maxPages, maxMemoryMB }) {
+        if (maxPages !== undefined) this.maxPages = maxPages;
+        if (maxMemoryMB !== undefined) this.maxMemoryMB = maxMemoryMB;
+    }
+
     /**
      * Get browser stats including memory
      */
@@ -237,14 +486,18 @@ class BrowserManager {
             isRunning: this.browser && this.browser.isConnected(),
             requestCount: this.requestCount,
             maxRequests: MAX_REQUESTS,
+            maxPages: this.maxPages,
             restartCount: this.restartCount,
+            persistentProfile: Boolean(this.profileDir),
+            profileResets: this.profileResets,
+            profileSizeMB: this.profileSizeMB,
             lastUsed: this.lastUsed ? new Date(this.lastUsed).toISOString() : null,
             idleTimeout: BROWSER_TIMEOUT / 1000 + 's',
             memory: {
                 currentMB: currentMemMB,
                 heapUsedMB: heapUsedMB,
                 peakMB: this.peakMemoryMB,
-                maxMB: MAX_MEMORY_MB,
+                maxMB: this.maxMemoryMB,
                 checkIntervalSec: MEMORY_CHECK_INTERVAL / 1000
             }
         };
@@ -5,6 +5,7 @@
 
 const fs = require('fs');
 const path = require('path');
+const tracer = require('./tracer');
 
 const MAX_CONCURRENT = 5; // Max parallel downloads
 const DEFAULT_DOWNLOAD_FOLDER = process.env.DOWNLOAD_PATH || path.join(require('os').homedir(), 'Downloads', 'Instagram');
@@ -15,6 +16,7 @@ class DownloadQueue {
         this.activeDownloads = 0;
         this.results = new Map(); // jobId -> result
         this.jobCounter = 0;
+        this.maxConcurrent = MAX_CONCURRENT;
     }
 
     /**
@@ -48,7 +50,8 @@ class DownloadQueue {
                 filename: item.filename,
                 type: item.type,
                 username,
-                downloadPath: baseFolder
+                downloadPath: baseFolder,
+                enqueuedAt: Date.now()
             });
         }
 
@@ -62,7 +65,7 @@ class DownloadQueue {
      * Process queue with parallel downloads
      */
     async processQueue() {
-        while (this.queue.length > 0 && this.activeDownloads < MAX_CONCURRENT) {
+        while (this.queue.length > 0 && this.activeDownloads < this.maxConcurrent) {
             const item = this.queue.shift();
             if (item) {
                 this.activeDownloads++;
@@ -80,6 +83,8 @@ class DownloadQueue {
     async downloadItem(item) {
         const { jobId, url, filename, type, username, downloadPath } = item;
         const result = this.results.get(jobId);
+        const trace = tracer.start('instagram.queue_item', { jobId, filename });
+        trace.addSpan('queue_wait', Date.now() - item.enqueuedAt);
 
         try {
             // Create user folder using custom or default path
@@ -95,32 +100,35 @@ class DownloadQueue {
             if (fs.existsSync(filePath)) {
                 result.completed++;
                 result.items.push({ filename, status: 'skipped', reason: 'exists' });
+                trace.end({ status: 'skipped' });
                 this.checkJobComplete(jobId);
                 return;
             }
 
             // Download file
             const fetch = (await import('node-fetch')).default;
-            const response = await fetch(url, {
+            const response = await trace.time('download_fetch', () => fetch(url, {
                 headers: {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
                     'Referer': 'https://www.instagram.com/'
                 },
                 timeout: 30000
-            });
+            }));
 
             if (!response.ok) {
                 throw new Error(`HTTP ${response.status}`);
             }
 
-            const buffer = await response.buffer();
-            fs.writeFileSync(filePath, buffer);
+            const buffer = await trace.time('download_body', () => response.buffer());
+            await trace.time('download_write', async () => fs.writeFileSync(filePath, buffer));
 
             result.completed++;
             result.items.push({ filename, status: 'success', path: filePath });
+            trace.end({ status: 'success', size: buffer.length });
             console.log(`✅ Downloaded: ${filename}`);
 
         } catch (error) {
+            trace.end({ status: 'failed', error: error.message });
             result.failed++;
             result.items.push({ filename, status: 'failed', error: error.message });
             console.error(`❌ Failed: ${filename} - ${error.message}`);
@@ -152,6 +160,17 @@ class DownloadQueue {
         return this.results.get(jobId) || { status: 'not_found' };
     }
 
+    /**
+     * Apply new limits at runtime (values are validated by the admin API)
+     */
+    configure({ maxConcurrent }) {
+        if (maxConcurrent !== undefined) {
+            this.maxConcurrent = maxConcurrent;
+            // Start extra workers right away if the limit was raised
+            this.processQueue();
+        }
+    }
+
     /**
      * Get queue stats
      */
@@ -159,7 +178,7 @@ class DownloadQueue {
         return {
             queueLength: this.queue.length,
             activeDownloads: this.activeDownloads,
-            maxConcurrent: MAX_CONCURRENT,
+            maxConcurrent: this.maxConcurrent,
             activeJobs: this.results.size
         };
     }
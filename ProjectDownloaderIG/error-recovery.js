@@ -30,19 +30,100 @@ const STRUCTURE_SIGNATURES = {
         'You must log in to continue',
         'Create an account',
         'Install the app'
+    ],
+    // Error pages
+    errorPatterns: [
+        'Page Not Found',
+        "isn't available"
+    ]
+};
+
+// Responses the scraper acts on directly (no retry / cooldown / session switch)
+const BLOCK_SIGNATURES = {
+    rateLimited: [
+        'Please wait a few minutes',
+        'Try again later',
+        'rate limit'
+    ],
+    loginWall: [
+        'You must log in to continue',
+        'Create an account'
+    ],
+    notFound: [
+        'Page Not Found',
+        "Sorry, this page isn't available"
     ]
 };
 
+/**
+ * Precompiled multi-pattern matcher over every signature above.
+ * One alternation regex finds all of them in a single pass; alternatives are
+ * ordered longest first, and a match also counts for every pattern it contains
+ * (e.g. "Sorry, this page isn't available" implies "isn't available").
+ * The alternation sits in a lookahead so a match consumes nothing: patterns that
+ * overlap (e.g. sharing a quote in `"video_url"video_versions"`) are all found,
+ * exactly like one includes() per pattern.
+ * Plain data so it can be passed into page.evaluate().
+ */
+const ALL_PATTERNS = [...new Set([
+    ...Object.values(STRUCTURE_SIGNATURES).flat(),
+    ...Object.values(BLOCK_SIGNATURES).flat()
+])].sort((a, b) => b.length - a.length);
+
+const MATCHER = {
+    source: `(?=(${ALL_PATTERNS.map(p => p.replace(/[.*+?^${}()|[\]\\]/g, '\\$&')).join('|')}))`,
+    implied: Object.fromEntries(ALL_PATTERNS.map(p => [p, ALL_PATTERNS.filter(q => p.includes(q))])),
+    total: ALL_PATTERNS.length
+};
+const MATCHER_REGEX = new RegExp(MATCHER.source, 'g');
+
 class ErrorRecovery {
     constructor() {
         this.errorCounts = {};
         this.lastDiagnostic = null;
+        this.matcher = MATCHER;
+    }
+
+    /**
+     * Find every known signature in a single pass over the HTML
+     * @returns {{found: Set<string>, length: number}}
+     */
+    scanHtml(html) {
+        const found = new Set();
+        MATCHER_REGEX.lastIndex = 0;
+        let match;
+        while (found.size < MATCHER.total && (match = MATCHER_REGEX.exec(html)) !== null) {
+            MATCHER_REGEX.lastIndex = match.index + 1; // Zero-width match - step past it
+            for (const pattern of MATCHER.implied[match[1]]) {
+                found.add(pattern);
+            }
+        }
+        return { found, length: html.length };
+    }
+
+    /**
+     * Blocking responses in a scan (rate limit, login wall, not found)
+     */
+    detectBlocks(scan) {
+        const blocks = {};
+        for (const [name, patterns] of Object.entries(BLOCK_SIGNATURES)) {
+            blocks[name] = patterns.some(p => scan.found.has(p));
+        }
+        return blocks;
     }
 
     /**
      * Analyze page content and detect structure issues
      */
     analyzePage(html, url) {
+        return this.buildDiagnostic(this.scanHtml(html), url);
+    }
+
+    /**
+     * Build a diagnostic from a scan (see scanHtml / page-analyzer)
+     */
+    buildDiagnostic(scan, url) {
+        const { found, length } = scan;
         const diagnostic = {
             url,
             timestamp: new Date().toISOString(),
@@ -54,7 +135,7 @@ class ErrorRecovery {
 
         // Check for login wall
         for (const warning of STRUCTURE_SIGNATURES.warningPatterns) {
-            if (html.includes(warning)) {
+            if (found.has(warning)) {
                 diagnostic.issues.push(`Login wall detected: "${warning}"`);
                 diagnostic.suggestions.push('Consider adding valid cookies.json');
                 diagnostic.structureValid = false;
@@ -62,7 +143,7 @@ class ErrorRecovery {
         }
 
         // Check if post structure elements exist
-        const foundPostElements = STRUCTURE_SIGNATURES.postElements.filter(el => html.includes(el));
+        const foundPostElements = STRUCTURE_SIGNATURES.postElements.filter(el => found.has(el));
         if (foundPostElements.length === 0) {
             diagnostic.issues.push('No post structure elements found');
             diagnostic.suggestions.push('Instagram may have changed page structure');
@@ -73,21 +154,21 @@ class ErrorRecovery {
         }
 
         // Check for media elements
-        const foundMediaElements = STRUCTURE_SIGNATURES.mediaElements.filter(el => html.includes(el));
+        const foundMediaElements = STRUCTURE_SIGNATURES.mediaElements.filter(el => found.has(el));
         if (foundMediaElements.length === 0) {
             diagnostic.issues.push('No media URL patterns found in page');
             diagnostic.suggestions.push('Post may be private or media patterns changed');
         }
 
         // Check page length (very short page = likely blocked)
-        if (html.length < 5000) {
-            diagnostic.issues.push(`Page unusually short (${html.length} chars)`);
+        if (length < 5000) {
+            diagnostic.issues.push(`Page unusually short (${length} chars)`);
             diagnostic.suggestions.push('May be blocked or rate limited');
             diagnostic.structureValid = false;
         }
 
         // Check for specific error pages
-        if (html.includes('Page Not Found') || html.includes("isn't available")) {
+        if (STRUCTURE_SIGNATURES.errorPatterns.some(p => found.has(p))) {
             diagnostic.issues.push('Post not found or unavailable');
             diagnostic.structureValid = false;
         }
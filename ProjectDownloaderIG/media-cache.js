@@ -0,0 +1,354 @@
+/**
+ * Media Cache - Size-capped on-disk LRU cache for /api/proxy
+ * Serves byte ranges and ETag/If-None-Match from disk, and stores
+ * upstream responses while they stream to the first client.
+ */
+
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+
+const CACHE_DIR = process.env.MEDIA_CACHE_DIR || path.join(__dirname, 'media-cache');
+const MAX_CACHE_MB = parseInt(process.env.MEDIA_CACHE_MAX_MB) || 512;
+const CACHEABLE_TYPES = /^(image|video|audio)\//;
+const CACHEABLE_HOSTS = /(^|\.)(cdninstagram\.com|fbcdn\.net)$/; // Keys ignore the host, so only Instagram's CDN
+
+class MediaCache {
+    constructor() {
+        this.entries = new Map(); // key -> { size, contentType } (Map order = LRU order)
+        this.totalBytes = 0;
+        this.maxBytes = MAX_CACHE_MB * 1024 * 1024;
+        this.loaded = false;
+        this.filling = new Set(); // keys with a background fill in progress
+        this.hits = 0;
+        this.misses = 0;
+        this.notModified = 0;
+        this.bytesSaved = 0;
+    }
+
+    /**
+     * Cache key from the CDN path (signature/expiry query params change per request)
+     * Instagram CDN paths identify the media; `stp` selects the rendition.
+     */
+    keyFor(url) {
+        let identity = url;
+        try {
+            const parsed = new URL(url);
+            identity = parsed.pathname + '|' + (parsed.searchParams.get('stp') || '');
+        } catch (e) {
+            // Not a valid URL - hash it as is
+        }
+        return crypto.createHash('sha256').update(identity).digest('hex').slice(0, 32);
+    }
+
+    /**
+     * Only Instagram CDN media is cached (/proxy accepts any URL)
+     */
+    isCacheableUrl(url) {
+        try {
+            const parsed = new URL(url);
+            return parsed.protocol === 'https:' && CACHEABLE_HOSTS.test(parsed.hostname);
+        } catch (e) {
+            return false;
+        }
+    }
+
+    dataPath(key) {
+        return path.join(CACHE_DIR, `${key}.bin`);
+    }
+
+    metaPath(key) {
+        return path.join(CACHE_DIR, `${key}.json`);
+    }
+
+    /**
+     * Build the in-memory index from disk (oldest first)
+     */
+    ensureLoaded() {
+        if (this.loaded) return;
+        this.loaded = true;
+
+        try {
+            fs.mkdirSync(CACHE_DIR, { recursive: true });
+            const found = [];
+            for (const name of fs.readdirSync(CACHE_DIR)) {
+                const filePath = path.join(CACHE_DIR, name);
+                if (name.includes('.tmp-')) {
+                    // Interrupted store
+                    fs.unlink(filePath, () => { });
+                    continue;
+                }
+                if (name.endsWith('.bin') && !fs.existsSync(this.metaPath(name.slice(0, -4)))) {
+                    // Data without metadata
+                    fs.unlink(filePath, () => { });
+                    continue;
+                }
+                if (!name.endsWith('.json')) continue;
+
+                const key = name.slice(0, -5);
+                try {
+                    const meta = JSON.parse(fs.readFileSync(filePath, 'utf-8'));
+                    const stat = fs.statSync(this.dataPath(key));
+                    if (stat.size !== meta.size) throw new Error('size mismatch');
+                    found.push({ key, meta, mtime: stat.mtimeMs });
+                } catch (e) {
+                    this.removeFiles(key);
+                }
+            }
+
+            found.sort((a, b) => a.mtime - b.mtime);
+            for (const { key, meta } of found) {
+                this.entries.set(key, { size: meta.size, contentType: meta.contentType });
+                this.totalBytes += meta.size;
+            }
+            this.evict();
+        } catch (e) {
+            console.error('Media cache load error:', e.message);
+        }
+    }
+
+    etagFor(key) {
+        return `"${key}"`;
+    }
+
+    /**
+     * Serve a cached response (200, 206, 304 or 416)
+     * @returns {boolean} true if the request was answered from cache
+     */
+    serve(req, res, url) {
+        if (!this.isCacheableUrl(url)) return false;
+        this.ensureLoaded();
+
+        const key = this.keyFor(url);
+        const entry = this.entries.get(key);
+        if (!entry) {
+            this.misses++;
+            return false;
+        }
+
+        // Move to most-recently-used
+        this.entries.delete(key);
+        this.entries.set(key, entry);
+        const now = new Date();
+        fs.utimes(this.dataPath(key), now, now, () => { });
+
+        this.hits++;
+        const etag = this.etagFor(key);
+        res.setHeader('ETag', etag);
+        res.setHeader('Accept-Ranges', 'bytes');
+        res.setHeader('Content-Type', entry.contentType);
+        res.setHeader('Content-Disposition', 'inline');
+        res.setHeader('Cache-Control', 'public, max-age=31536000');
+        res.setHeader('X-Cache', 'HIT');
+
+        const ifNoneMatch = req.headers['if-none-match'];
+        if (ifNoneMatch && ifNoneMatch.split(',').some(tag => tag.trim() === etag)) {
+            this.notModified++;
+            this.bytesSaved += entry.size;
+            res.status(304).end();
+            return true;
+        }
+
+        const range = this.parseRange(req.headers.range, entry.size);
+        if (range === 'invalid') {
+            res.setHeader('Content-Range', `bytes */${entry.size}`);
+            res.status(416).end();
+            return true;
+        }
+
+        const { start, end } = range || { start: 0, end: entry.size - 1 };
+        const length = end - start + 1;
+        this.bytesSaved += length;
+
+        if (range) {
+            res.status(206);
+            res.setHeader('Content-Range', `bytes ${start}-${end}/${entry.size}`);
+        }
+        res.setHeader('Content-Length', length);
+
+        if (req.method === 'HEAD') {
+            res.end();
+            return true;
+        }
+
+        const stream = fs.createReadStream(this.dataPath(key), { start, end });
+        stream.on('error', () => {
+            this.remove(key);
+            res.destroy();
+        });
+        stream.pipe(res);
+        return true;
+    }
+
+    /**
+     * Parse a single "bytes=start-end" range
+     * @returns {null|'invalid'|{start, end}}
+     */
+    parseRange(header, size) {
+        if (!header) return null;
+
+        const match = header.match(/^bytes=(\d*)-(\d*)$/);
+        if (!match || (match[1] === '' && match[2] === '')) {
+            // Multi-range or malformed - ignore and send everything
+            return null;
+        }
+
+        let start;
+        let end;
+        if (match[1] === '') {
+            // Suffix range: last N bytes
+            start = Math.max(0, size - parseInt(match[2]));
+            end = size - 1;
+        } else {
+            start = parseInt(match[1]);
+            end = match[2] === '' ? size - 1 : Math.min(parseInt(match[2]), size - 1);
+        }
+
+        if (start >= size || start > end) return 'invalid';
+        return { start, end };
+    }
+
+    /**
+     * Whether a response should be stored
+     */
+    isCacheable(contentType, contentLength) {
+        if (!contentType || !CACHEABLE_TYPES.test(contentType)) return false;
+        if (contentLength && parseInt(contentLength) > this.maxBytes / 4) return false;
+        return true;
+    }
+
+    /**
+     * Store a full upstream body while it streams to the client
+     * @param {string} url - Upstream URL
+     * @param {Readable} body - Upstream body stream (also piped to the client by the caller)
+     * @param {string} contentType
+     * @param {string|null} contentLength - Expected size from upstream headers
+     * @returns {boolean} true if the body is being stored
+     */
+    store(url, body, contentType, contentLength) {
+        if (!this.isCacheableUrl(url)) return false;
+        this.ensureLoaded();
+
+        const key = this.keyFor(url);
+        if (this.entries.has(key) || !this.isCacheable(contentType, contentLength)) return false;
+
+        const expected = contentLength ? parseInt(contentLength) : null;
+        const tmpPath = path.join(CACHE_DIR, `${key}.tmp-${process.pid}-${Date.now()}`);
+        const file = fs.createWriteStream(tmpPath);
+        let size = 0;
+        let failed = false;
+
+        const abort = () => {
+            if (failed) return;
+            failed = true;
+            file.destroy();
+            fs.unlink(tmpPath, () => { });
+        };
+
+        body.on('data', chunk => { size += chunk.length; });
+        body.on('error', abort);
+        body.on('aborted', abort);
+        file.on('error', abort);
+        body.pipe(file);
+
+        file.on('finish', () => {
+            if (failed) return;
+            if ((expected !== null && size !== expected) || size === 0 || size > this.maxBytes / 4) {
+                abort();
+                return;
+            }
+
+            try {
+                fs.renameSync(tmpPath, this.dataPath(key));
+                fs.writeFileSync(this.metaPath(key), JSON.stringify({ url, contentType, size, storedAt: new Date().toISOString() }));
+            } catch (e) {
+                abort();
+                return;
+            }
+
+            if (!this.entries.has(key)) {
+                this.totalBytes += size;
+            }
+            this.entries.set(key, { size, contentType });
+            this.evict();
+        });
+        return true;
+    }
+
+    /**
+     * Fetch and store a full body in the background (used after a ranged miss)
+     * @param {string} url
+     * @param {Function} fetchFull - async () => upstream Response without Range
+     */
+    async fill(url, fetchFull) {
+        const key = this.keyFor(url);
+        if (!this.isCacheableUrl(url) || this.entries.has(key) || this.filling.has(key)) return;
+
+        this.filling.add(key);
+        try {
+            const response = await fetchFull();
+            const storing = response.status === 200 &&
+                this.store(url, response.body, response.headers.get('content-type'), response.headers.get('content-length'));
+            if (!storing) {
+                // Not cacheable (e.g. too large) - release the upstream connection
+                response.body.destroy();
+                return;
+            }
+            await new Promise(resolve => {
+                response.body.on('end', resolve);
+                response.body.on('error', resolve);
+                response.body.on('close', resolve);
+            });
+        } catch (e) {
+            // Background fill is best-effort
+        } finally {
+            this.filling.delete(key);
+        }
+    }
+
+    /**
+     * Remove least-recently-used entries until under the size cap
+     */
+    evict() {
+        for (const key of this.entries.keys()) {
+            if (this.totalBytes <= this.maxBytes) break;
+            this.remove(key);
+        }
+    }
+
+    remove(key) {
+        const entry = this.entries.get(key);
+        if (entry) {
+            this.totalBytes -= entry.size;
+            this.entries.delete(key);
+        }
+        this.removeFiles(key);
+    }
+
+    removeFiles(key) {
+        fs.unlink(this.dataPath(key), () => { });
+        fs.unlink(this.metaPath(key), () => { });
+    }
+
+    /**
+     * Get media cache stats
+     */
+    getStats() {
+        const lookups = this.hits + this.misses;
+        return {
+            entries: this.entries.size,
+            sizeMB: Math.round(this.totalBytes / 1024 / 1024 * 10) / 10,
+            maxMB: MAX_CACHE_MB,
+            hits: this.hits,
+            misses: this.misses,
+            notModified: this.notModified,
+            hitRatio: lookups > 0 ? Math.round(this.hits / lookups * 1000) / 1000 : 0,
+            bytesSavedMB: Math.round(this.bytesSaved / 1024 / 1024 * 10) / 10
+        };
+    }
+}
+
+// Singleton instance
+const mediaCache = new MediaCache();
+
+module.exports = mediaCache;
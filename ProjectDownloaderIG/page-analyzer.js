@@ -0,0 +1,243 @@
+/**
+ * Page Analyzer - Detection and extraction in one page.evaluate() round trip
+ * Replaces page.content() + repeated html.includes() scans: block/structure
+ * signatures are found in a single pass over the document inside the browser,
+ * and media/username patterns run only over the embedded <script> JSON.
+ * Only the small result crosses back to Node; the full HTML is fetched
+ * separately when a diagnostic has to be saved.
+ */
+
+const errorRecovery = require('./error-recovery');
+
+/**
+ * Runs inside the page (must be self-contained - serialised by Puppeteer)
+ * @param {Object} matcher - errorRecovery.matcher ({ source, implied, total })
+ * @param {boolean} isReel
+ */
+function analyzeDocument(matcher, isReel) {
+    // Detection: one pass over the serialised document, stop once everything is found
+    const html = document.documentElement.outerHTML;
+    const regex = new RegExp(matcher.source, 'g');
+    const found = new Set();
+    let match;
+    while (found.size < matcher.total && (match = regex.exec(html)) !== null) {
+        regex.lastIndex = match.index + 1; // Zero-width match - step past it
+        for (const pattern of matcher.implied[match[1]]) {
+            found.add(pattern);
+        }
+    }
+
+    // Extraction: Instagram ships post data as JSON inside <script> tags
+    const json = Array.from(document.scripts, script => script.textContent).join('\n');
+
+    // Post owner, not commenters
+    const extractUsername = () => {
+        // Method 1: From owner.username in JSON (most reliable)
+        const ownerPatterns = [
+            /"owner"\s*:\s*\{[^}]*"username"\s*:\s*"([^"]+)"/,
+            /"user"\s*:\s*\{[^}]*"username"\s*:\s*"([^"]+)"/,
+            /"author"\s*:\s*\{[^}]*"username"\s*:\s*"([^"]+)"/
+        ];
+
+        for (const pattern of ownerPatterns) {
+            const match = json.match(pattern);
+            if (match && match[1] && match[1].length > 1) {
+                return match[1];
+            }
+        }
+
+        // Method 2: From article header link
+        const headerLink = document.querySelector('article header a[href^="/"]');
+        if (headerLink) {
+            const href = headerLink.getAttribute('href');
+            if (href && href.match(/^\/[a-zA-Z0-9_.]+\/?$/)) {
+                const name = href.replace(/\//g, '');
+                if (name && name.length > 1) return name;
+            }
+        }
+
+        // Method 3: From first username link in article
+        const usernameLinks = document.querySelectorAll('article a[href^="/"]');
+        for (const link of usernameLinks) {
+            const href = link.getAttribute('href');
+            if (href && href.match(/^\/[a-zA-Z0-9_.]+\/?$/) && !href.includes('/p/') && !href.includes('/reel/')) {
+                const name = href.replace(/\//g, '');
+                if (name && name.length > 1 && !['explore', 'reels', 'stories'].includes(name)) {
+                    return name;
+                }
+            }
+        }
+
+        // Method 4: From page title (@username pattern)
+        const title = document.title;
+        const titleMatch = title.match(/@([a-zA-Z0-9_.]+)/);
+        if (titleMatch && titleMatch[1]) return titleMatch[1];
+
+        // Method 5: From og:title or twitter:title meta
+        const metaTags = document.querySelectorAll('meta[property="og:title"], meta[name="twitter:title"]');
+        for (const meta of metaTags) {
+            const content = meta.getAttribute('content');
+            const match = content?.match(/@([a-zA-Z0-9_.]+)/);
+            if (match && match[1]) return match[1];
+        }
+
+        // Method 6: Search for username pattern in visible text
+        const usernamePattern = /"username"\s*:\s*"([a-zA-Z0-9_.]+)"/g;
+        const matches = [...json.matchAll(usernamePattern)];
+        if (matches.length > 0) {
+            // Return the first username found (usually the post owner)
+            return matches[0][1];
+        }
+
+        return 'unknown';
+    };
+
+    const extractMedia = () => {
+        const results = [];
+        const seenUrls = new Set();
+
+        const addMedia = (type, url) => {
+            if (url && !seenUrls.has(url)) {
+                seenUrls.add(url);
+                results.push({ type, url });
+            }
+        };
+
+        const decode = (url) => {
+            if (!url) return url;
+            return url
+                .replace(/\\u0026/g, '&')
+                .replace(/\\\//g, '/')
+                .replace(/\\/g, '');
+        };
+
+        // First, extract video thumbnail (specific patterns for video covers)
+        let videoThumbnail = null;
+
+        // Look for thumbnail_src which is video cover
+        const thumbSrcMatch = json.match(/"thumbnail_src"\s*:\s*"(https?:[^"]+)"/);
+        if (thumbSrcMatch && thumbSrcMatch[1]) {
+            videoThumbnail = decode(thumbSrcMatch[1]);
+        }
+
+        // Also try poster_url for videos
+        if (!videoThumbnail) {
+            const posterMatch = json.match(/"poster"\s*:\s*"(https?:[^"]+)"/);
+            if (posterMatch && posterMatch[1]) {
+                videoThumbnail = decode(posterMatch[1]);
+            }
+        }
+
+        // Try image from video media object
+        if (!videoThumbnail) {
+            // Look for display_url right before or after video_url
+            const videoSection = json.match(/"video_url"[^}]{0,500}"display_url"\s*:\s*"(https?:[^"]+)"/);
+            if (videoSection && videoSection[1]) {
+                videoThumbnail = decode(videoSection[1]);
+            }
+        }
+
+        // Fallback to first large image
+        if (!videoThumbnail) {
+            const displayMatch = json.match(/"display_url"\s*:\s*"(https?:[^"]+)"/);
+            if (displayMatch && displayMatch[1]) {
+                videoThumbnail = decode(displayMatch[1]);
+            }
+        }
+
+        // Fallback: Meta tags (Most reliable for Reels/Posts)
+        if (!videoThumbnail) {
+            const metaOg = document.querySelector('meta[property="og:image"]');
+            if (metaOg && metaOg.content) {
+                videoThumbnail = metaOg.content;
+            }
+        }
+        if (!videoThumbnail) {
+            const metaTwitter = document.querySelector('meta[property="twitter:image"]');
+            if (metaTwitter && metaTwitter.content) {
+                videoThumbnail = metaTwitter.content;
+            }
+        }
+
+        // Video patterns (for reels)
+        const videoUrlPatterns = [
+            /"video_url"\s*:\s*"(https?:[^"]+)"/g,
+            /"playback_url"\s*:\s*"(https?:[^"]+)"/g,
+            /"video_versions"\s*:\s*\[\s*\{\s*[^}]*"url"\s*:\s*"(https?:[^"]+)"/g,
+            /"src"\s*:\s*"(https?:[^"]+\.mp4[^"]*)"/g,
+            /"baseURL"\s*:\s*"(https?:[^"]+\.mp4[^"]*)"/g
+        ];
+
+        for (const pattern of videoUrlPatterns) {
+            let match;
+            while ((match = pattern.exec(json)) !== null) {
+                const url = decode(match[1]);
+                if (url && (url.includes('.mp4') || url.includes('video'))) {
+                    // Normalize URL: remove query params for deduplication
+                    const baseUrl = url.split('?')[0];
+                    if (!seenUrls.has(baseUrl)) {
+                        seenUrls.add(baseUrl);
+                        results.push({ type: 'video', url, thumbnail: videoThumbnail });
+                    }
+                }
+            }
+        }
+
+        // Image patterns
+        const imagePatterns = [
+            /"display_url"\s*:\s*"(https?:[^"]+)"/g,
+            /"display_src"\s*:\s*"(https?:[^"]+)"/g,
+            /"candidates"\s*:\s*\[\s*\{\s*"url"\s*:\s*"(https?:[^"]+)"/g
+        ];
+
+        for (const pattern of imagePatterns) {
+            let match;
+            while ((match = pattern.exec(json)) !== null) {
+                const url = decode(match[1]);
+                if (url &&
+                    !url.includes('s150x150') &&
+                    !url.includes('s320x320') &&
+                    !url.includes('s640x640') &&
+                    (url.includes('scontent') || url.includes('cdninstagram') || url.includes('fbcdn'))) {
+                    addMedia('image', url);
+                }
+            }
+        }
+
+        // For Reels, prioritize video
+        if (isReel && results.some(r => r.type === 'video')) {
+            return results.filter(r => r.type === 'video');
+        }
+
+        return results;
+    };
+
+    return {
+        found: [...found],
+        length: html.length,
+        username: extractUsername(),
+        media: extractMedia()
+    };
+}
+
+/**
+ * Analyze the loaded post page
+ * @param {Page} page - Puppeteer page on the post/reel
+ * @param {boolean} isReel
+ * @returns {Promise<{scan: {found: Set<string>, length: number}, blocks: Object, username: string, media: Array}>}
+ */
+async function analyzePostPage(page, isReel) {
+    const result = await page.evaluate(analyzeDocument, errorRecovery.matcher, isReel);
+    const scan = { found: new Set(result.found), length: result.length };
+
+    return {
+        scan,
+        blocks: errorRecovery.detectBlocks(scan),
+        username: result.username,
+        media: result.media
+    };
+}
+
+module.exports = {
+    analyzePostPage
+};
@@ -1,58 +1,349 @@
 /**
  * Rate Limiter - Prevent Instagram ban by controlling request frequency
- * Ensures minimum delay between requests and max requests per minute
+ * Token bucket per account + endpoint, with fair FIFO waiting per bucket.
+ * When the launcher hosts a rate coordinator (RATE_COORDINATOR env), all
+ * server processes reserve tokens from the same shared budget.
  */
 
-const MIN_DELAY_MS = 1000; // Minimum 1 second between requests (reduced from 2s for speed)
-const MAX_REQUESTS_PER_MINUTE = 20; // Max 20 requests per minute (increased for speed)
-const BURST_COOLDOWN_MS = 30000; // 30 second cooldown after burst (reduced from 1 min)
+const net = require('net');
+
+const MIN_DELAY_MS = 1000; // Minimum 1 second between requests on the same bucket
+const MAX_REQUESTS_PER_MINUTE = 20; // Bucket refill rate
+const BURST_SIZE = 5; // Bucket capacity (requests allowed back-to-back)
+const BURST_COOLDOWN_MS = 30000; // Default manual cooldown duration
+const COORDINATOR_TIMEOUT_MS = 1000; // Fall back to local buckets if coordinator is slower
+const COORDINATOR_RETRY_MS = 5000; // Wait before reconnecting to a dead coordinator
+
+/**
+ * Token bucket with reservation semantics.
+ * Tokens may go negative: each reservation is queued behind the previous one,
+ * so the returned wait is exact and grants come out in arrival order.
+ * The launcher coordinator implements the same algorithm in Python.
+ */
+class TokenBucket {
+    constructor() {
+        this.tokens = null;
+        this.updatedAt = 0;
+        this.lastGrantAt = 0;
+        this.grants = 0;
+    }
+
+    /**
+     * Reserve one token
+     * @param {number} now - Current time in ms
+     * @param {Object} config - { minDelayMs, maxRequestsPerMinute, burstSize }
+     * @param {number} cooldownUntil - No grants before this time
+     * @returns {number} ms to wait before the reserved token may be used
+     */
+    reserve(now, config, cooldownUntil = 0) {
+        const capacity = Math.max(1, config.burstSize);
+        const ratePerMs = config.maxRequestsPerMinute / 60000;
+
+        if (this.tokens === null) {
+            this.tokens = capacity;
+            this.updatedAt = now;
+        }
+
+        // Refill up to the later of now and the last reservation
+        let start = Math.max(now, this.updatedAt);
+        let tokens = Math.min(capacity, this.tokens + (start - this.updatedAt) * ratePerMs);
+
+        // Respect cooldown and minimum spacing
+        const earliest = Math.max(start, cooldownUntil, this.lastGrantAt ? this.lastGrantAt + config.minDelayMs : 0);
+        tokens = Math.min(capacity, tokens + (earliest - start) * ratePerMs);
+        start = earliest;
+
+        // Not enough tokens yet - move the grant to when one is available
+        if (tokens < 1) {
+            start += Math.ceil((1 - tokens) / ratePerMs);
+            tokens = 1;
+        }
+
+        this.tokens = tokens - 1;
+        this.updatedAt = start;
+        this.lastGrantAt = start;
+        this.grants++;
+
+        return start - now;
+    }
+
+    /**
+     * Tokens available right now (without reserving)
+     */
+    available(now, config) {
+        if (this.tokens === null) return config.burstSize;
+        if (now < this.updatedAt) return this.tokens;
+        const ratePerMs = config.maxRequestsPerMinute / 60000;
+        return Math.min(config.burstSize, this.tokens + (now - this.updatedAt) * ratePerMs);
+    }
+}
+
+/**
+ * Client for the launcher-hosted rate coordinator.
+ * Speaks newline-delimited JSON over a Unix socket (or named pipe / tcp://host:port).
+ */
+class CoordinatorClient {
+    constructor(address) {
+        this.address = address;
+        this.socket = null;
+        this.connected = false;
+        this.connecting = null; // In-flight connect (shared by concurrent requests)
+        this.pending = new Map(); // request id -> { resolve, reject, timer }
+        this.abandoned = new Map(); // request id -> payload of a request that timed out
+        this.nextId = 1;
+        this.buffer = '';
+        this.retryAt = 0;
+    }
+
+    /**
+     * Parse RATE_COORDINATOR value into net.connect options
+     */
+    connectOptions() {
+        const match = this.address.match(/^tcp:\/\/([^:]+):(\d+)$/);
+        if (match) {
+            return { host: match[1], port: parseInt(match[2]) };
+        }
+        return { path: this.address };
+    }
+
+    /**
+     * Connect lazily; resolves false if coordinator is unavailable
+     * Concurrent callers share one connection attempt.
+     */
+    ensureConnected() {
+        if (this.connected) return Promise.resolve(true);
+        if (this.connecting) return this.connecting;
+        if (Date.now() < this.retryAt) return Promise.resolve(false);
+
+        this.connecting = new Promise(resolve => {
+            const socket = net.connect(this.connectOptions());
+            socket.setEncoding('utf-8');
+
+            socket.once('connect', () => {
+                this.socket = socket;
+                this.connected = true;
+                console.log(`🔗 Connected to rate coordinator (${this.address})`);
+                resolve(true);
+            });
+
+            socket.on('data', chunk => this.onData(chunk));
+
+            socket.on('error', () => {
+                // 'close' follows and handles cleanup
+                resolve(false);
+            });
+
+            socket.on('close', () => {
+                resolve(false);
+                if (this.socket && this.socket !== socket) return; // Not the live socket
+
+                if (this.connected) {
+                    console.log('⚠️ Rate coordinator disconnected - using local buckets');
+                }
+                this.connected = false;
+                this.socket = null;
+                this.retryAt = Date.now() + COORDINATOR_RETRY_MS;
+                this.failPending(new Error('Coordinator disconnected'));
+                this.abandoned.clear();
+            });
+        }).finally(() => {
+            this.connecting = null;
+        });
+
+        return this.connecting;
+    }
+
+    onData(chunk) {
+        this.buffer += chunk;
+        let newline;
+        while ((newline = this.buffer.indexOf('\n')) !== -1) {
+            const line = this.buffer.slice(0, newline);
+            this.buffer = this.buffer.slice(newline + 1);
+            if (!line.trim()) continue;
+
+            try {
+                const message = JSON.parse(line);
+                const entry = this.pending.get(message.id);
+                if (entry) {
+                    clearTimeout(entry.timer);
+                    this.pending.delete(message.id);
+                    entry.resolve(message);
+                } else if (this.abandoned.has(message.id)) {
+                    this.onLateResponse(this.abandoned.get(message.id), message);
+                    this.abandoned.delete(message.id);
+                }
+            } catch (e) {
+                // Ignore malformed lines
+            }
+        }
+    }
+
+    /**
+     * A reservation granted after we gave up on it was reserved locally instead -
+     * hand the coordinator's token back so the request is not counted twice
+     */
+    onLateResponse(payload, message) {
+        if (payload.op === 'reserve' && message.waitMs !== undefined) {
+            this.send({ op: 'release', key: payload.key });
+        }
+    }
+
+    /**
+     * Send a message without waiting for its response
+     */
+    send(payload) {
+        if (this.connected && this.socket) {
+            this.socket.write(JSON.stringify({ id: null, ...payload }) + '\n');
+        }
+    }
+
+    failPending(error) {
+        for (const entry of this.pending.values()) {
+            clearTimeout(entry.timer);
+            entry.reject(error);
+        }
+        this.pending.clear();
+    }
+
+    /**
+     * Send a request and wait for the matching response
+     */
+    async request(payload) {
+        if (!(await this.ensureConnected())) {
+            throw new Error('Coordinator unavailable');
+        }
+
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                this.pending.delete(id);
+                this.abandoned.set(id, payload);
+                reject(new Error('Coordinator timeout'));
+            }, COORDINATOR_TIMEOUT_MS);
+
+            this.pending.set(id, { resolve, reject, timer });
+            this.socket.write(JSON.stringify({ id, ...payload }) + '\n');
+        });
+    }
+}
 
 class RateLimiter {
     constructor() {
+        this.config = {
+            minDelayMs: MIN_DELAY_MS,
+            maxRequestsPerMinute: MAX_REQUESTS_PER_MINUTE,
+            burstSize: BURST_SIZE
+        };
+        this.buckets = new Map(); // key -> TokenBucket (local mode)
+        this.queues = new Map(); // key -> [{ resolve, enqueuedAt }]
+        this.cooldowns = new Map(); // account -> throttleUntil
         this.lastRequestTime = 0;
-        this.requestTimestamps = [];
-        this.isThrottled = false;
-        this.throttleUntil = 0;
+        this.totalWaitMs = 0;
+        this.coordinator = process.env.RATE_COORDINATOR
+            ? new CoordinatorClient(process.env.RATE_COORDINATOR)
+            : null;
+    }
+
+    /**
+     * Build bucket key from account and endpoint
+     */
+    bucketKey(account, endpoint) {
+        return `${account}:${endpoint}`;
     }
 
     /**
      * Wait until it's safe to make a request
+     * Callers for the same bucket are served strictly first-in, first-out.
+     * @param {Object} options - { account, endpoint }
      * @returns {Promise<void>}
      */
-    async waitForSlot() {
-        // Check if we're in cooldown
-        if (this.isThrottled && Date.now() < this.throttleUntil) {
-            const waitTime = this.throttleUntil - Date.now();
-            console.log(`🚦 Rate limited - waiting ${Math.ceil(waitTime / 1000)}s cooldown...`);
-            await this.sleep(waitTime);
-            this.isThrottled = false;
+    waitForSlot({ account = 'anonymous', endpoint = 'default' } = {}) {
+        const key = this.bucketKey(account, endpoint);
+
+        return new Promise(resolve => {
+            if (!this.queues.has(key)) {
+                this.queues.set(key, []);
+            }
+            const queue = this.queues.get(key);
+            queue.push({ resolve, enqueuedAt: Date.now() });
+
+            // First waiter starts the pump; later ones just queue up
+            if (queue.length === 1) {
+                this.pump(key, account);
+            }
+        });
+    }
+
+    /**
+     * Serve a bucket's queue head by head
+     */
+    async pump(key, account) {
+        const queue = this.queues.get(key);
+
+        while (queue.length > 0) {
+            const waitMs = await this.reserve(key, account);
+            if (waitMs > 0) {
+                console.log(`⏳ Rate limit delay [${key}]: ${waitMs}ms (${queue.length} queued)`);
+                await this.sleep(waitMs);
+            }
+
+            // A cooldown may have been triggered while we were waiting - keep the
+            // reserved token and use it once the cooldown is over
+            let throttleUntil;
+            while (Date.now() < (throttleUntil = this.cooldowns.get(account) || 0)) {
+                const cooldownMs = throttleUntil - Date.now();
+                console.log(`🚦 Rate limited [${account}] - waiting ${Math.ceil(cooldownMs / 1000)}s cooldown...`);
+                await this.sleep(cooldownMs);
+            }
+
+            const waiter = queue.shift();
+            const now = Date.now();
+            this.totalWaitMs += now - waiter.enqueuedAt;
+            this.lastRequestTime = now;
+            waiter.resolve();
         }
 
-        // Clean old timestamps (older than 1 minute)
-        const oneMinuteAgo = Date.now() - 60000;
-        this.requestTimestamps = this.requestTimestamps.filter(ts => ts > oneMinuteAgo);
-
-        // Check requests per minute limit
-        if (this.requestTimestamps.length >= MAX_REQUESTS_PER_MINUTE) {
-            console.log(`⚠️ Burst limit reached (${MAX_REQUESTS_PER_MINUTE}/min) - entering cooldown`);
-            this.isThrottled = true;
-            this.throttleUntil = Date.now() + BURST_COOLDOWN_MS;
-            await this.sleep(BURST_COOLDOWN_MS);
-            this.isThrottled = false;
-            this.requestTimestamps = [];
+        this.queues.delete(key);
+    }
+
+    /**
+     * Reserve a token from the shared coordinator, or the local bucket
+     * @returns {Promise<number>} ms to wait
+     */
+    async reserve(key, account) {
+        if (this.coordinator) {
+            try {
+                const response = await this.coordinator.request({
+                    op: 'reserve',
+                    key,
+                    account,
+                    config: this.config
+                });
+                if (typeof response.waitMs !== 'number') {
+                    throw new Error(response.error || 'Invalid coordinator response');
+                }
+                return Math.max(0, Math.ceil(response.waitMs));
+            } catch (e) {
+                // Coordinator down - fall through to local bucket
+            }
         }
 
-        // Ensure minimum delay between requests (skip for first request)
-        const timeSinceLastRequest = Date.now() - this.lastRequestTime;
-        if (this.lastRequestTime > 0 && timeSinceLastRequest < MIN_DELAY_MS) {
-            const waitTime = MIN_DELAY_MS - timeSinceLastRequest;
-            console.log(`⏳ Rate limit delay: ${waitTime}ms`);
-            await this.sleep(waitTime);
+        if (!this.buckets.has(key)) {
+            this.buckets.set(key, new TokenBucket());
         }
+        const throttleUntil = this.cooldowns.get(account) || 0;
+        return this.buckets.get(key).reserve(Date.now(), this.config, throttleUntil);
+    }
 
-        // Record this request
-        this.lastRequestTime = Date.now();
-        this.requestTimestamps.push(this.lastRequestTime);
+    /**
+     * Apply new limits at runtime (values are validated by the admin API)
+     * The config object is replaced as a whole, so a reservation never sees a mix.
+     */
+    configure({ minDelayMs, maxRequestsPerMinute }) {
+        const config = { ...this.config };
+        if (minDelayMs !== undefined) config.minDelayMs = minDelayMs;
+        if (maxRequestsPerMinute !== undefined) config.maxRequestsPerMinute = maxRequestsPerMinute;
+        this.config = config;
     }
 
     /**
@@ -76,23 +367,47 @@ class RateLimiter {
      * Get rate limiter stats
      */
     getStats() {
+        const now = Date.now();
+        const throttled = [...this.cooldowns.entries()].filter(([, until]) => until > now);
+        const buckets = {};
+
+        for (const [key, bucket] of this.buckets) {
+            buckets[key] = {
+                tokens: Math.round(bucket.available(now, this.config) * 100) / 100,
+                grants: bucket.grants
+            };
+        }
+        for (const [key, queue] of this.queues) {
+            buckets[key] = { ...(buckets[key] || {}), queued: queue.length };
+        }
+
         return {
+            mode: this.coordinator && this.coordinator.connected ? 'coordinator' : 'local',
             lastRequestTime: this.lastRequestTime ? new Date(this.lastRequestTime).toISOString() : null,
-            requestsLastMinute: this.requestTimestamps.length,
-            maxRequestsPerMinute: MAX_REQUESTS_PER_MINUTE,
-            minDelayMs: MIN_DELAY_MS,
-            isThrottled: this.isThrottled,
-            throttleUntil: this.isThrottled ? new Date(this.throttleUntil).toISOString() : null
+            maxRequestsPerMinute: this.config.maxRequestsPerMinute,
+            minDelayMs: this.config.minDelayMs,
+            burstSize: this.config.burstSize,
+            totalWaitMs: this.totalWaitMs,
+            isThrottled: throttled.length > 0,
+            throttleUntil: throttled.length > 0
+                ? new Date(Math.max(...throttled.map(([, until]) => until))).toISOString()
+                : null,
+            buckets
         };
     }
 
     /**
      * Manual throttle (e.g., if we detect rate limiting from Instagram)
+     * Applies to every endpoint of the account, in all processes when coordinated.
      */
-    triggerCooldown(durationMs = BURST_COOLDOWN_MS) {
-        console.log(`🛑 Manual cooldown triggered for ${durationMs / 1000}s`);
-        this.isThrottled = true;
-        this.throttleUntil = Date.now() + durationMs;
+    triggerCooldown(durationMs = BURST_COOLDOWN_MS, account = 'anonymous') {
+        console.log(`🛑 Manual cooldown triggered for ${durationMs / 1000}s [${account}]`);
+        const until = Date.now() + durationMs;
+        this.cooldowns.set(account, Math.max(until, this.cooldowns.get(account) || 0));
+
+        if (this.coordinator) {
+            this.coordinator.request({ op: 'cooldown', account, durationMs }).catch(() => { });
+        }
     }
 }
 
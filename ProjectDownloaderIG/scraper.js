@@ -5,13 +5,13 @@
  * Includes auto-retry, rate limiting, and error recovery
  */
 
-const fs = require('fs');
-const path = require('path');
 const browserManager = require('./browser-manager');
 const rateLimiter = require('./rate-limiter');
 const errorRecovery = require('./error-recovery');
+const sessionPool = require('./session-pool');
+const tracer = require('./tracer');
+const { analyzePostPage } = require('./page-analyzer');
 
-const COOKIES_PATH = path.join(__dirname, 'cookies.json');
 const TIMEOUT = parseInt(process.env.TIMEOUT) || 60000;
 const MAX_RETRIES = 3;
 const RETRY_DELAY_MS = 1000; // Base delay, increases exponentially
@@ -63,26 +63,6 @@ function extractShortcode(url) {
     return match ? match[1] : null;
 }
 
-/**
- * Load cookies from file
- */
-function loadCookies() {
-    try {
-        if (fs.existsSync(COOKIES_PATH)) {
-            const cookies = JSON.parse(fs.readFileSync(COOKIES_PATH, 'utf-8'));
-            if (Array.isArray(cookies) && cookies.length > 0) {
-                const sessionCookie = cookies.find(c => c.name === 'sessionid');
-                if (sessionCookie && !sessionCookie.value.includes('YOUR_')) {
-                    return cookies;
-                }
-            }
-        }
-    } catch (e) {
-        console.error('Cookie error:', e.message);
-    }
-    return [];
-}
-
 function delay(ms) {
     return new Promise(resolve => setTimeout(resolve, ms));
 }
@@ -101,8 +81,10 @@ function decodeUrl(url) {
 /**
  * Main scraper function - handles posts and reels
  * Includes auto-retry for reliability
+ * @param {string} url - Post or reel URL
+ * @param {Trace} trace - Request trace from tracer.start() (optional)
  */
-async function scrapeInstagramPost(url) {
+async function scrapeInstagramPost(url, trace = tracer.NOOP_TRACE) {
     // Validate URL first (no retry needed for invalid URLs)
     if (!isValidInstagramUrl(url)) {
         return { success: false, error: 'Invalid URL. Please enter a valid Instagram post or reel URL.', code: 'INVALID_URL' };
@@ -116,10 +98,14 @@ async function scrapeInstagramPost(url) {
     const isReel = isReelUrl(url);
     console.log('Processing shortcode:', shortcode, isReel ? '(REEL)' : '(POST)');
 
+    // Sessions that failed this request are skipped on retry
+    const triedSessions = new Set();
+    let attempt = 0;
+
     // Use retry wrapper for the actual scraping
     try {
         return await withRetry(
-            () => scrapeWithPage(url, shortcode, isReel),
+            () => scrapeWithPage(url, shortcode, isReel, triedSessions, trace, ++attempt),
             MAX_RETRIES,
             `Scraping ${shortcode}`
         );
@@ -135,26 +121,24 @@ async function scrapeInstagramPost(url) {
 
 /**
  * Internal scraper function (called by retry wrapper)
+ * Every stage is recorded as a span on the trace, tagged with the attempt number.
  */
-async function scrapeWithPage(url, shortcode, isReel) {
+async function scrapeWithPage(url, shortcode, isReel, triedSessions = new Set(), trace = tracer.NOOP_TRACE, attempt = 1) {
     let page = null;
+    let session = null;
+    const time = (stage, fn) => trace.time(stage, fn, { attempt });
 
     try {
+        // Least-loaded healthy account (each has its own rate budget)
+        session = sessionPool.acquire(triedSessions);
+        const account = session.id;
+
         // Wait for rate limiter slot (prevents Instagram ban)
-        await rateLimiter.waitForSlot();
-
-        // Get page from browser pool (fast - reuses browser)
-        page = await browserManager.getPage();
-        console.log('⚡ Got page from browser pool');
-
-        // Load cookies if available
-        const cookies = loadCookies();
-        if (cookies.length > 0) {
-            await page.setCookie(...cookies);
-            console.log('Cookies loaded');
-        } else {
-            console.log('No valid cookies');
-        }
+        await time('rate_limit_wait', () => rateLimiter.waitForSlot({ account, endpoint: isReel ? 'reel' : 'post' }));
+
+        // Get page in the session's isolated context (cookies already loaded there)
+        page = await time('get_page', () => sessionPool.getPage(session));
+        console.log(`⚡ Got page from browser pool (session: ${session.username})`);
 
         // Navigate to post
         const postUrl = isReel
@@ -164,39 +148,51 @@ async function scrapeWithPage(url, shortcode, isReel) {
         console.log('Loading:', postUrl);
 
         // Add small random jitter to avoid detection patterns (reduced for speed)
-        await rateLimiter.addJitter(100);
+        await time('jitter', () => rateLimiter.addJitter(100));
 
-        await page.goto(postUrl, {
+        await time('goto', () => page.goto(postUrl, {
             waitUntil: 'domcontentloaded', // Faster than networkidle2
             timeout: TIMEOUT
-        });
+        }));
 
-        await delay(500); // Reduced from 1000ms for faster performance
+        await time('settle_delay', () => delay(500)); // Reduced from 1000ms for faster performance
 
-        // Check for errors (don't retry these - they're permanent)
-        const pageContent = await page.content();
+        // Detection + extraction in one pass inside the page (no full HTML transfer)
+        const analysis = await time('analyze_page', () => analyzePostPage(page, isReel));
+        const { blocks, username } = analysis;
 
-        // Run diagnostic analysis on page
         const pageUrl = isReel
             ? `https://www.instagram.com/reel/${shortcode}/`
             : `https://www.instagram.com/p/${shortcode}/`;
-        const diagnostic = errorRecovery.analyzePage(pageContent, pageUrl);
+        const diagnostic = errorRecovery.buildDiagnostic(analysis.scan, pageUrl);
 
         // Check for rate limiting response from Instagram
-        if (pageContent.includes('Please wait a few minutes') ||
-            pageContent.includes('Try again later') ||
-            pageContent.includes('rate limit')) {
+        if (blocks.rateLimited) {
             console.log('🚨 Instagram rate limit detected! Triggering cooldown...');
-            rateLimiter.triggerCooldown(120000); // 2 minute cooldown
+            rateLimiter.triggerCooldown(120000, account); // 2 minute cooldown
             errorRecovery.trackError('RATE_LIMIT');
+            // Move to another account if there is one; otherwise retry this one after the cooldown
+            if (sessionPool.quarantine(session, 'RATE_LIMIT')) {
+                triedSessions.add(session.id);
+            }
             throw new Error('Instagram rate limit detected');
         }
 
         // Check for login wall
-        if (pageContent.includes('You must log in to continue') ||
-            pageContent.includes('Create an account')) {
+        if (blocks.loginWall) {
             console.log('🔒 Login wall detected');
             errorRecovery.trackError('LOGIN_REQUIRED');
+
+            // The only healthy session is never quarantined, so the next request tries again
+            if (sessionPool.quarantine(session, 'LOGIN_REQUIRED')) {
+                triedSessions.add(session.id);
+            }
+
+            // Another account may still be logged in - retry with it
+            if (sessionPool.hasHealthyAlternative(session, triedSessions)) {
+                throw new Error('Instagram login wall - retrying with another session');
+            }
+
             await browserManager.releasePage(page);
             return {
                 success: false,
@@ -205,209 +201,23 @@ async function scrapeWithPage(url, shortcode, isReel) {
             };
         }
 
-        if (pageContent.includes('Page Not Found') ||
-            pageContent.includes("Sorry, this page isn't available")) {
+        // Permanent error - don't retry
+        if (blocks.notFound) {
             await browserManager.releasePage(page);
             errorRecovery.trackError('NOT_FOUND');
             // Return directly without retry for permanent errors
             return { success: false, error: 'Post not found', code: 'NOT_FOUND' };
         }
 
-        // If page structure seems invalid, save diagnostic
+        // If page structure seems invalid, save diagnostic (only now is the full HTML pulled)
         if (!diagnostic.structureValid) {
             console.log('⚠️ Page structure issues detected:', diagnostic.issues);
+            const pageContent = await time('content', () => page.content());
             await errorRecovery.saveDiagnostic(pageContent, diagnostic);
         }
 
-        // Extract username from page - get POST OWNER, not commenters
-        const username = await page.evaluate(() => {
-            const html = document.documentElement.innerHTML;
-
-            // Method 1: From owner.username in JSON (most reliable)
-            const ownerPatterns = [
-                /"owner"\s*:\s*\{[^}]*"username"\s*:\s*"([^"]+)"/,
-                /"user"\s*:\s*\{[^}]*"username"\s*:\s*"([^"]+)"/,
-                /"author"\s*:\s*\{[^}]*"username"\s*:\s*"([^"]+)"/
-            ];
-
-            for (const pattern of ownerPatterns) {
-                const match = html.match(pattern);
-                if (match && match[1] && match[1].length > 1) {
-                    return match[1];
-                }
-            }
-
-            // Method 2: From article header link
-            const headerLink = document.querySelector('article header a[href^="/"]');
-            if (headerLink) {
-                const href = headerLink.getAttribute('href');
-                if (href && href.match(/^\/[a-zA-Z0-9_.]+\/?$/)) {
-                    const name = href.replace(/\//g, '');
-                    if (name && name.length > 1) return name;
-                }
-            }
-
-            // Method 3: From first username link in article
-            const usernameLinks = document.querySelectorAll('article a[href^="/"]');
-            for (const link of usernameLinks) {
-                const href = link.getAttribute('href');
-                if (href && href.match(/^\/[a-zA-Z0-9_.]+\/?$/) && !href.includes('/p/') && !href.includes('/reel/')) {
-                    const name = href.replace(/\//g, '');
-                    if (name && name.length > 1 && !['explore', 'reels', 'stories'].includes(name)) {
-                        return name;
-                    }
-                }
-            }
-
-            // Method 4: From page title (@username pattern)
-            const title = document.title;
-            const titleMatch = title.match(/@([a-zA-Z0-9_.]+)/);
-            if (titleMatch && titleMatch[1]) return titleMatch[1];
-
-            // Method 5: From og:title or twitter:title meta
-            const metaTags = document.querySelectorAll('meta[property="og:title"], meta[name="twitter:title"]');
-            for (const meta of metaTags) {
-                const content = meta.getAttribute('content');
-                const match = content?.match(/@([a-zA-Z0-9_.]+)/);
-                if (match && match[1]) return match[1];
-            }
-
-            // Method 6: Search for username pattern in visible text
-            const usernamePattern = /"username"\s*:\s*"([a-zA-Z0-9_.]+)"/g;
-            const matches = [...html.matchAll(usernamePattern)];
-            if (matches.length > 0) {
-                // Return the first username found (usually the post owner)
-                return matches[0][1];
-            }
-
-            return 'unknown';
-        });
-
         console.log('Username:', username);
-
-        // Extract from page source
-        console.log('Extracting from page source...');
-
-        const extractedMedia = await page.evaluate((isReel) => {
-            const html = document.documentElement.innerHTML;
-            const results = [];
-            const seenUrls = new Set();
-
-            const addMedia = (type, url) => {
-                if (url && !seenUrls.has(url)) {
-                    seenUrls.add(url);
-                    results.push({ type, url });
-                }
-            };
-
-            const decode = (url) => {
-                if (!url) return url;
-                return url
-                    .replace(/\\u0026/g, '&')
-                    .replace(/\\\//g, '/')
-                    .replace(/\\/g, '');
-            };
-
-            // First, extract video thumbnail (specific patterns for video covers)
-            let videoThumbnail = null;
-
-            // Look for thumbnail_src which is video cover
-            const thumbSrcMatch = html.match(/"thumbnail_src"\s*:\s*"(https?:[^"]+)"/);
-            if (thumbSrcMatch && thumbSrcMatch[1]) {
-                videoThumbnail = decode(thumbSrcMatch[1]);
-            }
-
-            // Also try poster_url for videos
-            if (!videoThumbnail) {
-                const posterMatch = html.match(/"poster"\s*:\s*"(https?:[^"]+)"/);
-                if (posterMatch && posterMatch[1]) {
-                    videoThumbnail = decode(posterMatch[1]);
-                }
-            }
-
-            // Try image from video media object
-            if (!videoThumbnail) {
-                // Look for display_url right before or after video_url
-                const videoSection = html.match(/"video_url"[^}]{0,500}"display_url"\s*:\s*"(https?:[^"]+)"/);
-                if (videoSection && videoSection[1]) {
-                    videoThumbnail = decode(videoSection[1]);
-                }
-            }
-
-            // Fallback to first large image
-            if (!videoThumbnail) {
-                const displayMatch = html.match(/"display_url"\s*:\s*"(https?:[^"]+)"/);
-                if (displayMatch && displayMatch[1]) {
-                    videoThumbnail = decode(displayMatch[1]);
-                }
-            }
-
-            // Fallback: Meta tags (Most reliable for Reels/Posts)
-            if (!videoThumbnail) {
-                const metaOg = document.querySelector('meta[property="og:image"]');
-                if (metaOg && metaOg.content) {
-                    videoThumbnail = metaOg.content;
-                }
-            }
-            if (!videoThumbnail) {
-                const metaTwitter = document.querySelector('meta[property="twitter:image"]');
-                if (metaTwitter && metaTwitter.content) {
-                    videoThumbnail = metaTwitter.content;
-                }
-            }
-
-            // Video patterns (for reels)
-            const videoUrlPatterns = [
-                /"video_url"\s*:\s*"(https?:[^"]+)"/g,
-                /"playback_url"\s*:\s*"(https?:[^"]+)"/g,
-                /"video_versions"\s*:\s*\[\s*\{\s*[^}]*"url"\s*:\s*"(https?:[^"]+)"/g,
-                /"src"\s*:\s*"(https?:[^"]+\.mp4[^"]*)"/g,
-                /"baseURL"\s*:\s*"(https?:[^"]+\.mp4[^"]*)"/g
-            ];
-
-            for (const pattern of videoUrlPatterns) {
-                let match;
-                while ((match = pattern.exec(html)) !== null) {
-                    const url = decode(match[1]);
-                    if (url && (url.includes('.mp4') || url.includes('video'))) {
-                        // Normalize URL: remove query params for deduplication
-                        const baseUrl = url.split('?')[0];
-                        if (!seenUrls.has(baseUrl)) {
-                            seenUrls.add(baseUrl);
-                            results.push({ type: 'video', url, thumbnail: videoThumbnail });
-                        }
-                    }
-                }
-            }
-
-            // Image patterns
-            const imagePatterns = [
-                /"display_url"\s*:\s*"(https?:[^"]+)"/g,
-                /"display_src"\s*:\s*"(https?:[^"]+)"/g,
-                /"candidates"\s*:\s*\[\s*\{\s*"url"\s*:\s*"(https?:[^"]+)"/g
-            ];
-
-            for (const pattern of imagePatterns) {
-                let match;
-                while ((match = pattern.exec(html)) !== null) {
-                    const url = decode(match[1]);
-                    if (url &&
-                        !url.includes('s150x150') &&
-                        !url.includes('s320x320') &&
-                        !url.includes('s640x640') &&
-                        (url.includes('scontent') || url.includes('cdninstagram') || url.includes('fbcdn'))) {
-                        addMedia('image', url);
-                    }
-                }
-            }
-
-            // For Reels, prioritize video
-            if (isReel && results.some(r => r.type === 'video')) {
-                return results.filter(r => r.type === 'video');
-            }
-
-            return results;
-        }, isReel);
+        const extractedMedia = analysis.media;
 
         if (extractedMedia.length > 0) {
             console.log(`Found ${extractedMedia.length} media from page source`);
@@ -428,6 +238,7 @@ async function scrapeWithPage(url, shortcode, isReel) {
         // Carousel navigation for image posts
         if (!isReel) {
             console.log('Navigating carousel...');
+            const endCarousel = trace.span('carousel', { attempt });
 
             const carouselMedia = [];
             const seenUrls = new Set();
@@ -435,7 +246,7 @@ async function scrapeWithPage(url, shortcode, isReel) {
             const maxSlides = 20;
 
             const extractCurrentView = async () => {
-                return await page.evaluate(() => {
+                return await time('carousel_extract', () => page.evaluate(() => {
                     const results = [];
                     const article = document.querySelector('article');
                     if (!article) return results;
@@ -469,7 +280,7 @@ async function scrapeWithPage(url, shortcode, isReel) {
                     }
 
                     return results;
-                });
+                }));
             };
 
             let currentMedia = await extractCurrentView();
@@ -493,7 +304,7 @@ async function scrapeWithPage(url, shortcode, isReel) {
                 if (!hasNext) break;
 
                 slideCount++;
-                await delay(400); // Reduced from 800ms
+                await time('carousel_delay', () => delay(400)); // Reduced from 800ms
 
                 currentMedia = await extractCurrentView();
                 for (const m of currentMedia) {
@@ -504,6 +315,8 @@ async function scrapeWithPage(url, shortcode, isReel) {
                 }
             }
 
+            endCarousel({ slides: slideCount + 1 });
+
             if (carouselMedia.length > 0) {
                 console.log(`Found ${carouselMedia.length} media from carousel`);
                 await browserManager.releasePage(page);
@@ -515,9 +328,10 @@ async function scrapeWithPage(url, shortcode, isReel) {
         console.log('⚠️ No media found, saving diagnostic...');
         errorRecovery.trackError('NO_MEDIA');
 
-        // Save diagnostic for debugging
-        const finalDiagnostic = errorRecovery.analyzePage(pageContent, pageUrl);
+        // Save diagnostic for debugging (reuses the scan - no second pass)
+        const finalDiagnostic = errorRecovery.buildDiagnostic(analysis.scan, pageUrl);
         finalDiagnostic.issues.push('No media extracted after all attempts');
+        const pageContent = await time('content', () => page.content());
         await errorRecovery.saveDiagnostic(pageContent, finalDiagnostic);
 
         await browserManager.releasePage(page);
@@ -529,6 +343,8 @@ async function scrapeWithPage(url, shortcode, isReel) {
         if (page) await browserManager.releasePage(page);
         // Re-throw to trigger retry
         throw error;
+    } finally {
+        if (session) sessionPool.release(session);
     }
 }
 
@@ -0,0 +1,360 @@
+/**
+ * Session Pool - Multiple Instagram accounts with isolated browser contexts
+ * Each cookie set gets its own browser context, with cookies loaded once per context.
+ * Scrapes are routed to the least-loaded healthy session; sessions that hit
+ * login walls or rate-limit pages are quarantined for a while.
+ * With a persistent browser profile, the primary session uses the browser's
+ * default context so its cookies, cache and service workers survive recycles.
+ */
+
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+const browserManager = require('./browser-manager');
+
+const COOKIES_PATH = path.join(__dirname, 'cookies.json'); // Primary account
+const COOKIES_DIR = path.join(__dirname, 'cookies'); // Additional accounts (*.json)
+const RELOAD_CHECK_MS = 5000; // How often cookie files are checked for changes
+
+// How long a session is kept out of rotation per failure type
+const QUARANTINE_MS = {
+    LOGIN_REQUIRED: 30 * 60 * 1000,
+    RATE_LIMIT: 2 * 60 * 1000
+};
+
+class Session {
+    constructor(id, username, cookies, source) {
+        this.id = id;
+        this.username = username;
+        this.cookies = cookies;
+        this.source = source;
+        this.context = null; // Promise of the BrowserContext (shared by concurrent scrapes)
+        this.contextBrowser = null;
+        this.cookiesLoaded = false;
+        this.cookiesLoading = null; // Pending cookie load
+        this.persistent = false; // Uses the profile's default context
+        this.active = 0;
+        this.requests = 0;
+        this.failures = 0;
+        this.quarantinedUntil = 0;
+        this.quarantineReason = null;
+    }
+
+    isQuarantined(now = Date.now()) {
+        return now < this.quarantinedUntil;
+    }
+}
+
+class SessionPool {
+    constructor() {
+        this.sessions = new Map(); // id -> Session
+        this.fileMtimes = new Map(); // file -> mtimeMs
+        this.lastReloadCheck = 0;
+    }
+
+    /**
+     * Read a cookie export and return it if it has a usable session cookie
+     */
+    readCookieFile(file) {
+        try {
+            const cookies = JSON.parse(fs.readFileSync(file, 'utf-8'));
+            if (Array.isArray(cookies) && cookies.length > 0) {
+                const sessionCookie = cookies.find(c => c.name === 'sessionid');
+                if (sessionCookie && sessionCookie.value && !sessionCookie.value.includes('YOUR_')) {
+                    return cookies;
+                }
+            }
+        } catch (e) {
+            console.error(`Cookie error (${path.basename(file)}):`, e.message);
+        }
+        return null;
+    }
+
+    /**
+     * List cookie files (primary + cookies/ directory)
+     */
+    listCookieFiles() {
+        const files = [];
+        if (fs.existsSync(COOKIES_PATH)) {
+            files.push(COOKIES_PATH);
+        }
+        if (fs.existsSync(COOKIES_DIR)) {
+            for (const name of fs.readdirSync(COOKIES_DIR)) {
+                if (name.endsWith('.json')) {
+                    files.push(path.join(COOKIES_DIR, name));
+                }
+            }
+        }
+        return files;
+    }
+
+    /**
+     * Reload sessions when cookie files were added, changed or removed
+     */
+    reloadIfChanged() {
+        const now = Date.now();
+        if (this.sessions.size > 0 && now - this.lastReloadCheck < RELOAD_CHECK_MS) {
+            return;
+        }
+        this.lastReloadCheck = now;
+
+        const files = this.listCookieFiles();
+        const mtimes = new Map();
+        for (const file of files) {
+            try {
+                mtimes.set(file, fs.statSync(file).mtimeMs);
+            } catch (e) {
+                // File vanished between readdir and stat
+            }
+        }
+
+        const unchanged = this.sessions.size > 0 &&
+            mtimes.size === this.fileMtimes.size &&
+            [...mtimes].every(([file, mtime]) => this.fileMtimes.get(file) === mtime);
+        if (unchanged) return;
+
+        this.fileMtimes = mtimes;
+        this.loadSessions([...mtimes.keys()]);
+    }
+
+    /**
+     * Build the session map from cookie files, keeping state of unchanged sessions
+     */
+    loadSessions(files) {
+        const next = new Map();
+
+        for (const file of files) {
+            const cookies = this.readCookieFile(file);
+            if (!cookies) continue;
+
+            const id = cookies.find(c => c.name === 'ds_user_id')?.value || path.basename(file, '.json');
+            const username = cookies.find(c => c.name === 'ds_user')?.value || id;
+            if (next.has(id)) continue; // Same account exported twice
+
+            const existing = this.sessions.get(id);
+            const sameCookies = existing &&
+                JSON.stringify(existing.cookies) === JSON.stringify(cookies);
+
+            if (sameCookies) {
+                next.set(id, existing);
+            } else {
+                // New or refreshed cookies - fresh context and no quarantine
+                if (existing) this.closeContext(existing);
+                next.set(id, new Session(id, username, cookies, file));
+            }
+        }
+
+        // No logged-in accounts: one anonymous session
+        if (next.size === 0) {
+            next.set('anonymous', this.sessions.get('anonymous') || new Session('anonymous', 'anonymous', [], null));
+        }
+
+        for (const [id, session] of this.sessions) {
+            if (!next.has(id)) this.closeContext(session);
+        }
+
+        // Primary account (cookies.json first) gets the persistent default context
+        let index = 0;
+        for (const session of next.values()) {
+            const persistent = Boolean(browserManager.profileDir) && index++ === 0;
+            if (session.persistent !== persistent) {
+                this.closeContext(session);
+                session.persistent = persistent;
+            }
+        }
+
+        this.sessions = next;
+        console.log(`👥 Session pool: ${[...next.values()].map(s => s.username).join(', ')}`);
+    }
+
+    /**
+     * Pick the least-loaded healthy session
+     * @param {Set<string>} exclude - Session ids to skip (e.g. already failed this request)
+     * @returns {Session}
+     */
+    acquire(exclude = new Set()) {
+        this.reloadIfChanged();
+
+        const now = Date.now();
+        const healthy = [...this.sessions.values()].filter(s => !s.isQuarantined(now));
+        // Every healthy session already failed this request - try them again
+        const untried = healthy.filter(s => !exclude.has(s.id));
+        const candidates = (untried.length > 0 ? untried : healthy)
+            .sort((a, b) => (a.active - b.active) || (a.requests - b.requests));
+
+        if (candidates.length === 0) {
+            const error = new Error('All Instagram sessions are quarantined. Try again later or add more accounts.');
+            error.code = 'NO_HEALTHY_SESSION';
+            throw error;
+        }
+
+        const session = candidates[0];
+        session.active++;
+        session.requests++;
+        return session;
+    }
+
+    /**
+     * Return a session after a scrape
+     */
+    release(session) {
+        session.active = Math.max(0, session.active - 1);
+    }
+
+    /**
+     * Check if another session could take over a request
+     * @param {Session} session
+     * @param {Set<string>} exclude - Session ids already tried for this request
+     */
+    hasHealthyAlternative(session, exclude = new Set()) {
+        const now = Date.now();
+        return [...this.sessions.values()].some(s => s !== session && !exclude.has(s.id) && !s.isQuarantined(now));
+    }
+
+    /**
+     * Take a session out of rotation
+     * The last healthy session is never quarantined - with a single account (or
+     * none) that would fail every scrape, even public posts, until it expires.
+     * @param {Session} session
+     * @param {string} reason - LOGIN_REQUIRED or RATE_LIMIT
+     * @returns {boolean} true if the session was quarantined
+     */
+    quarantine(session, reason) {
+        if (!this.hasHealthyAlternative(session)) {
+            return false;
+        }
+
+        const duration = QUARANTINE_MS[reason] || QUARANTINE_MS.RATE_LIMIT;
+        session.failures++;
+        session.quarantinedUntil = Date.now() + duration;
+        session.quarantineReason = reason;
+        console.log(`🚧 Session ${session.username} quarantined for ${duration / 1000}s (${reason})`);
+        return true;
+    }
+
+    /**
+     * Fingerprint of a cookie export (to know if the profile already has it)
+     */
+    cookiesHash(cookies) {
+        return crypto.createHash('sha256').update(JSON.stringify(cookies)).digest('hex');
+    }
+
+    /**
+     * Get a page inside the session's browser context
+     */
+    async getPage(session) {
+        const browser = await browserManager.getBrowser();
+
+        // Browser was recycled - old context is gone
+        // (the promise is stored before awaiting so concurrent scrapes share one context)
+        if (!session.context || session.contextBrowser !== browser) {
+            if (session.persistent) {
+                session.context = Promise.resolve(browser.defaultBrowserContext());
+                // The profile keeps cookies (including ones Instagram refreshed) across
+                // restarts - only load the export again when it changed
+                session.cookiesLoaded = browserManager.getProfileState('cookiesHash') === this.cookiesHash(session.cookies);
+            } else {
+                session.context = browser.createBrowserContext();
+                session.cookiesLoaded = false;
+            }
+            session.contextBrowser = browser;
+            session.cookiesLoading = null;
+        }
+
+        const contextPromise = session.context;
+        let context;
+        try {
+            context = await contextPromise;
+        } catch (error) {
+            if (session.context === contextPromise) {
+                session.context = null;
+                session.contextBrowser = null;
+            }
+            throw error;
+        }
+
+        const page = await browserManager.getPage(context);
+
+        // Cookies live in the context's cookie jar, so one setCookie covers every later page
+        if (!session.cookiesLoaded && (session.cookies.length > 0 || session.persistent)) {
+            if (!session.cookiesLoading) {
+                session.cookiesLoading = this.loadCookies(session, page).finally(() => {
+                    session.cookiesLoading = null;
+                });
+            }
+            try {
+                await session.cookiesLoading;
+            } catch (error) {
+                // The caller never gets this page - don't leave the tab open
+                await browserManager.releasePage(page);
+                throw error;
+            }
+        }
+
+        return page;
+    }
+
+    /**
+     * Load the session's cookie export into its context
+     */
+    async loadCookies(session, page) {
+        if (session.persistent) {
+            // Drop the previous account's cookies from the profile
+            const client = await page.createCDPSession();
+            await client.send('Network.clearBrowserCookies');
+            await client.detach();
+        }
+        if (session.cookies.length > 0) {
+            await page.setCookie(...session.cookies);
+        }
+        session.cookiesLoaded = true;
+        if (session.persistent) {
+            browserManager.setProfileState('cookiesHash', this.cookiesHash(session.cookies));
+        }
+        console.log(`Cookies loaded for ${session.username}`);
+    }
+
+    /**
+     * Close a session's browser context
+     */
+    closeContext(session) {
+        if (session.context) {
+            // The default context lives as long as the browser
+            if (!session.persistent) {
+                session.context.then(context => context.close()).catch(() => { });
+            }
+            session.context = null;
+            session.contextBrowser = null;
+            session.cookiesLoaded = false;
+            session.cookiesLoading = null;
+        }
+    }
+
+    /**
+     * Get session pool stats
+     */
+    getStats() {
+        this.reloadIfChanged();
+        const now = Date.now();
+
+        return {
+            total: this.sessions.size,
+            healthy: [...this.sessions.values()].filter(s => !s.isQuarantined(now)).length,
+            sessions: [...this.sessions.values()].map(s => ({
+                username: s.username,
+                persistent: s.persistent,
+                active: s.active,
+                requests: s.requests,
+                failures: s.failures,
+                quarantined: s.isQuarantined(now),
+                quarantineReason: s.isQuarantined(now) ? s.quarantineReason : null,
+                quarantinedUntil: s.isQuarantined(now) ? new Date(s.quarantinedUntil).toISOString() : null
+            }))
+        };
+    }
+}
+
+// Singleton instance
+const sessionPool = new SessionPool();
+
+module.exports = sessionPool;
@@ -0,0 +1,267 @@
+/**
+ * Tracer - Lightweight per-stage timing for scrape and download requests
+ * Each finished trace is appended as one JSON line to a rotating trace file,
+ * and every span feeds an in-memory latency histogram (p50/p95/p99 per stage).
+ */
+
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+
+const TRACE_DIR = process.env.TRACE_DIR || path.join(__dirname, 'traces');
+const TRACE_FILE = 'traces.jsonl';
+const MAX_FILE_MB = parseInt(process.env.TRACE_MAX_MB) || 10; // Rotate when the file gets this big
+const MAX_FILES = 3; // traces.jsonl + traces.1.jsonl + traces.2.jsonl
+const BUCKET_GROWTH = 1.1; // Histogram bucket width (~10% relative error on percentiles)
+const PERCENTILES = [50, 95, 99];
+
+/**
+ * Log-scale latency histogram: constant memory, no samples kept
+ */
+class Histogram {
+    constructor() {
+        this.buckets = new Map(); // bucket index -> count
+        this.count = 0;
+        this.sum = 0;
+        this.max = 0;
+    }
+
+    record(ms) {
+        const index = ms <= 1 ? 0 : Math.ceil(Math.log(ms) / Math.log(BUCKET_GROWTH));
+        this.buckets.set(index, (this.buckets.get(index) || 0) + 1);
+        this.count++;
+        this.sum += ms;
+        this.max = Math.max(this.max, ms);
+    }
+
+    /**
+     * Upper bound of the bucket holding the p-th percentile
+     */
+    percentile(p) {
+        if (this.count === 0) return null;
+
+        const rank = Math.ceil(this.count * p / 100);
+        const indexes = [...this.buckets.keys()].sort((a, b) => a - b);
+        let seen = 0;
+        for (const index of indexes) {
+            seen += this.buckets.get(index);
+            if (seen >= rank) {
+                return Math.round(Math.min(this.max, Math.pow(BUCKET_GROWTH, index)));
+            }
+        }
+        return Math.round(this.max);
+    }
+
+    toJSON() {
+        const stats = {
+            count: this.count,
+            avgMs: this.count > 0 ? Math.round(this.sum / this.count) : null,
+            maxMs: Math.round(this.max)
+        };
+        for (const p of PERCENTILES) {
+            stats[`p${p}`] = this.percentile(p);
+        }
+        return stats;
+    }
+}
+
+/**
+ * One traced request (e.g. a single /download call)
+ */
+class Trace {
+    constructor(tracer, name, attributes) {
+        this.tracer = tracer;
+        this.id = crypto.randomBytes(8).toString('hex');
+        this.name = name;
+        this.attributes = { ...attributes };
+        this.startedAt = Date.now();
+        this.startedHr = process.hrtime.bigint();
+        this.spans = [];
+        this.ended = false;
+    }
+
+    elapsedMs(since = this.startedHr) {
+        return Number(process.hrtime.bigint() - since) / 1e6;
+    }
+
+    /**
+     * Start a span; call the returned function to end it
+     * @param {string} stage - Stage name (histogram key)
+     * @param {Object} attributes - Extra fields stored with the span
+     * @returns {Function} end(extraAttributes)
+     */
+    span(stage, attributes = {}) {
+        const startedHr = process.hrtime.bigint();
+        const offsetMs = this.elapsedMs();
+
+        return (extra = {}) => {
+            const durationMs = this.elapsedMs(startedHr);
+            this.spans.push({
+                stage,
+                startMs: Math.round(offsetMs * 10) / 10,
+                durationMs: Math.round(durationMs * 10) / 10,
+                ...attributes,
+                ...extra
+            });
+            this.tracer.record(stage, durationMs);
+        };
+    }
+
+    /**
+     * Add a span whose duration was measured elsewhere (e.g. time spent queued)
+     */
+    addSpan(stage, durationMs, attributes = {}) {
+        this.spans.push({
+            stage,
+            startMs: 0,
+            durationMs: Math.round(durationMs * 10) / 10,
+            ...attributes
+        });
+        this.tracer.record(stage, durationMs);
+    }
+
+    /**
+     * Time an async function as one span (the span ends even if it throws)
+     */
+    async time(stage, fn, attributes = {}) {
+        const end = this.span(stage, attributes);
+        try {
+            return await fn();
+        } finally {
+            end();
+        }
+    }
+
+    /**
+     * Finish the trace and write it out
+     */
+    end(attributes = {}) {
+        if (this.ended) return;
+        this.ended = true;
+
+        const durationMs = this.elapsedMs();
+        this.tracer.record(this.name, durationMs);
+        this.tracer.write({
+            traceId: this.id,
+            name: this.name,
+            timestamp: new Date(this.startedAt).toISOString(),
+            durationMs: Math.round(durationMs * 10) / 10,
+            ...this.attributes,
+            ...attributes,
+            spans: this.spans
+        });
+    }
+}
+
+/**
+ * Stand-in used when no trace was passed down, so callers never null-check
+ */
+const NOOP_TRACE = {
+    span: () => () => { },
+    addSpan: () => { },
+    time: (stage, fn) => fn(),
+    end: () => { }
+};
+
+class Tracer {
+    constructor() {
+        this.histograms = new Map(); // stage -> Histogram
+        this.stream = null;
+        this.fileBytes = 0;
+        this.writeErrors = 0;
+    }
+
+    /**
+     * Start a new trace
+     * @param {string} name - Request type, e.g. 'instagram.scrape'
+     * @param {Object} attributes - Fields stored with the trace (url, shortcode...)
+     */
+    start(name, attributes = {}) {
+        return new Trace(this, name, attributes);
+    }
+
+    record(stage, durationMs) {
+        if (!this.histograms.has(stage)) {
+            this.histograms.set(stage, new Histogram());
+        }
+        this.histograms.get(stage).record(durationMs);
+    }
+
+    /**
+     * Open the trace file for appending (lazily, on first write)
+     */
+    openStream() {
+        fs.mkdirSync(TRACE_DIR, { recursive: true });
+        const filePath = path.join(TRACE_DIR, TRACE_FILE);
+        try {
+            this.fileBytes = fs.statSync(filePath).size;
+        } catch (e) {
+            this.fileBytes = 0;
+        }
+
+        this.stream = fs.createWriteStream(filePath, { flags: 'a' });
+        this.stream.on('error', (error) => {
+            this.writeErrors++;
+            console.error('Trace write error:', error.message);
+            this.stream = null;
+        });
+    }
+
+    /**
+     * Shift traces.jsonl -> traces.1.jsonl -> traces.2.jsonl (oldest dropped)
+     */
+    rotate() {
+        if (this.stream) {
+            this.stream.end();
+            this.stream = null;
+        }
+
+        const rotated = (n) => path.join(TRACE_DIR, n === 0 ? TRACE_FILE : TRACE_FILE.replace('.jsonl', `.${n}.jsonl`));
+        try {
+            fs.rmSync(rotated(MAX_FILES - 1), { force: true });
+            for (let n = MAX_FILES - 2; n >= 0; n--) {
+                if (fs.existsSync(rotated(n))) {
+                    fs.renameSync(rotated(n), rotated(n + 1));
+                }
+            }
+        } catch (e) {
+            console.error('Trace rotate error:', e.message);
+        }
+    }
+
+    write(record) {
+        try {
+            if (!this.stream) this.openStream();
+
+            const line = JSON.stringify(record) + '\n';
+            this.stream.write(line);
+            this.fileBytes += Buffer.byteLength(line);
+
+            if (this.fileBytes > MAX_FILE_MB * 1024 * 1024) {
+                this.rotate();
+            }
+        } catch (e) {
+            this.writeErrors++;
+        }
+    }
+
+    /**
+     * Latency percentiles per stage
+     */
+    getStats() {
+        const stages = {};
+        for (const [stage, histogram] of this.histograms) {
+            stages[stage] = histogram.toJSON();
+        }
+        return {
+            writeErrors: this.writeErrors,
+            stages
+        };
+    }
+}
+
+// Singleton instance
+const tracer = new Tracer();
+
+module.exports = tracer;
+module.exports.NOOP_TRACE = NOOP_TRACE;
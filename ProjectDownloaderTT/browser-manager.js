@@ -27,6 +27,8 @@ class BrowserManager {
         this.memoryCheckTimer = null;
         this.peakMemoryMB = 0;
         this.restartCount = 0;
+        this.maxPages = MAX_PAGES;
+        this.maxMemoryMB = MAX_MEMORY_MB;
     }
 
     /**
@@ -94,8 +96,8 @@ class BrowserManager {
             }
 
             // Force restart if memory too high
-            if (rssMB > MAX_MEMORY_MB) {
-                console.log(`⚠️ Memory usage high: ${rssMB}MB > ${MAX_MEMORY_MB}MB - restarting browser`);
+            if (rssMB > this.maxMemoryMB) {
+                console.log(`⚠️ Memory usage high: ${rssMB}MB > ${this.maxMemoryMB}MB - restarting browser`);
                 this.restartCount++;
                 await this.closeBrowser();
             }
@@ -148,7 +150,7 @@ class BrowserManager {
 
         // Check current page count
         const pages = await browser.pages();
-        if (pages.length >= MAX_PAGES) {
+        if (pages.length >= this.maxPages) {
             // Close oldest page (skip first which is usually blank)
             const oldestPage = pages[1];
             if (oldestPage) {
@@ -267,6 +269,15 @@ class BrowserManager {
         this.requestCount = 0;
     }
 
+    /**
+     * Apply new limits at runtime (values are validated by the admin API)
+     * Lower limits take effect on the next getPage() / memory check.
+     */
+    configure({ maxPages, maxMemoryMB }) {
+        if (maxPages !== undefined) this.maxPages = maxPages;
+        if (maxMemoryMB !== undefined) this.maxMemoryMB = maxMemoryMB;
+    }
+
     /**
      * Get browser stats including memory
      */
@@ -279,6 +290,7 @@ class BrowserManager {
             isRunning: this.browser && this.browser.isConnected(),
             requestCount: this.requestCount,
             maxRequests: MAX_REQUESTS,
+            maxPages: this.maxPages,
             restartCount: this.restartCount,
             lastUsed: this.lastUsed ? new Date(this.lastUsed).toISOString() : null,
             idleTimeout: BROWSER_TIMEOUT / 1000 + 's',
@@ -286,7 +298,7 @@ class BrowserManager {
                 currentMB: currentMemMB,
                 heapUsedMB: heapUsedMB,
                 peakMB: this.peakMemoryMB,
-                maxMB: MAX_MEMORY_MB,
+                maxMB: this.maxMemoryMB,
                 checkIntervalSec: MEMORY_CHECK_INTERVAL / 1000
             }
         };
@@ -16,6 +16,7 @@ class DownloadQueue {
         this.activeDownloads = 0;
         this.results = new Map();
         this.jobCounter = 0;
+        this.maxConcurrent = MAX_CONCURRENT;
     }
 
     addBatch(items, username, downloadPath = '') {
@@ -47,7 +48,7 @@ class DownloadQueue {
     }
 
     async processQueue() {
-        while (this.queue.length > 0 && this.activeDownloads < MAX_CONCURRENT) {
+        while (this.queue.length > 0 && this.activeDownloads < this.maxConcurrent) {
             const item = this.queue.shift();
             if (item) {
                 this.activeDownloads++;
@@ -218,11 +219,18 @@ class DownloadQueue {
         return this.results.get(jobId) || { status: 'not_found' };
     }
 
+    configure({ maxConcurrent }) {
+        if (maxConcurrent !== undefined) {
+            this.maxConcurrent = maxConcurrent;
+            this.processQueue();
+        }
+    }
+
     getStats() {
         return {
             queueLength: this.queue.length,
             activeDownloads: this.activeDownloads,
-            maxConcurrent: MAX_CONCURRENT,
+            maxConcurrent: this.maxConcurrent,
             activeJobs: this.results.size
         };
     }
@@ -13,6 +13,10 @@ class RateLimiter {
         this.requestTimestamps = [];
         this.isThrottled = false;
         this.throttleUntil = 0;
+        this.config = {
+            minDelayMs: MIN_DELAY_MS,
+            maxRequestsPerMinute: MAX_REQUESTS_PER_MINUTE
+        };
     }
 
     /**
@@ -33,8 +37,8 @@ class RateLimiter {
         this.requestTimestamps = this.requestTimestamps.filter(ts => ts > oneMinuteAgo);
 
         // Check requests per minute limit
-        if (this.requestTimestamps.length >= MAX_REQUESTS_PER_MINUTE) {
-            console.log(`⚠️ Burst limit reached (${MAX_REQUESTS_PER_MINUTE}/min) - entering cooldown`);
+        if (this.requestTimestamps.length >= this.config.maxRequestsPerMinute) {
+            console.log(`⚠️ Burst limit reached (${this.config.maxRequestsPerMinute}/min) - entering cooldown`);
             this.isThrottled = true;
             this.throttleUntil = Date.now() + BURST_COOLDOWN_MS;
             await this.sleep(BURST_COOLDOWN_MS);
@@ -44,8 +48,8 @@ class RateLimiter {
 
         // Ensure minimum delay between requests
         const timeSinceLastRequest = Date.now() - this.lastRequestTime;
-        if (timeSinceLastRequest < MIN_DELAY_MS) {
-            const waitTime = MIN_DELAY_MS - timeSinceLastRequest;
+        if (timeSinceLastRequest < this.config.minDelayMs) {
+            const waitTime = this.config.minDelayMs - timeSinceLastRequest;
             console.log(`⏳ Rate limit delay: ${waitTime}ms`);
             await this.sleep(waitTime);
         }
@@ -55,6 +59,16 @@ class RateLimiter {
         this.requestTimestamps.push(this.lastRequestTime);
     }
 
+    /**
+     * Apply new limits at runtime (values are validated by the admin API)
+     */
+    configure({ minDelayMs, maxRequestsPerMinute }) {
+        const config = { ...this.config };
+        if (minDelayMs !== undefined) config.minDelayMs = minDelayMs;
+        if (maxRequestsPerMinute !== undefined) config.maxRequestsPerMinute = maxRequestsPerMinute;
+        this.config = config;
+    }
+
     /**
      * Add random jitter to avoid detection patterns
      * @param {number} baseDelay - Base delay in ms
@@ -79,8 +93,8 @@ class RateLimiter {
         return {
             lastRequestTime: this.lastRequestTime ? new Date(this.lastRequestTime).toISOString() : null,
             requestsLastMinute: this.requestTimestamps.length,
-            maxRequestsPerMinute: MAX_REQUESTS_PER_MINUTE,
-            minDelayMs: MIN_DELAY_MS,
+            maxRequestsPerMinute: this.config.maxRequestsPerMinute,
+            minDelayMs: this.config.minDelayMs,
             isThrottled: this.isThrottled,
             throttleUntil: this.isThrottled ? new Date(this.throttleUntil).toISOString() : null
         };
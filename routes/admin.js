@@ -0,0 +1,195 @@
+/**
+ * Admin Router for Unified Server
+ * Runtime reconfiguration of queue, rate limit and browser limits
+ * Only reachable from this machine (and with the launcher's token when set)
+ */
+
+const express = require('express');
+const router = express.Router();
+const path = require('path');
+
+const IG_PATH = path.join(__dirname, '..', 'ProjectDownloaderIG');
+const TT_PATH = path.join(__dirname, '..', 'ProjectDownloaderTT');
+
+const ADMIN_TOKEN = process.env.ADMIN_TOKEN || '';
+const LOOPBACK_ADDRESSES = ['127.0.0.1', '::1', '::ffff:127.0.0.1'];
+const LOOPBACK_HOSTS = /^(127\.0\.0\.1|localhost|\[::1\])(:\d+)?$/i;
+
+// Platform -> modules whose limits can be changed
+const PLATFORMS = {
+    instagram: {
+        downloadQueue: require(path.join(IG_PATH, 'download-queue')),
+        rateLimiter: require(path.join(IG_PATH, 'rate-limiter')),
+        browserManager: require(path.join(IG_PATH, 'browser-manager'))
+    },
+    tiktok: {
+        downloadQueue: require(path.join(TT_PATH, 'download-queue')),
+        rateLimiter: require(path.join(TT_PATH, 'rate-limiter')),
+        browserManager: require(path.join(TT_PATH, 'browser-manager'))
+    }
+};
+
+// Allowed range for each limit (integers)
+const LIMITS = {
+    maxConcurrent: { min: 1, max: 20 },
+    maxRequestsPerMinute: { min: 1, max: 120 },
+    minDelayMs: { min: 0, max: 60000 },
+    maxPages: { min: 1, max: 20 },
+    maxMemoryMB: { min: 200, max: 8192 }
+};
+
+/**
+ * Current limits of a platform
+ */
+function getLimits(modules) {
+    const rateStats = modules.rateLimiter.getStats();
+    return {
+        maxConcurrent: modules.downloadQueue.maxConcurrent,
+        maxRequestsPerMinute: rateStats.maxRequestsPerMinute,
+        minDelayMs: rateStats.minDelayMs,
+        maxPages: modules.browserManager.maxPages,
+        maxMemoryMB: modules.browserManager.maxMemoryMB
+    };
+}
+
+/**
+ * Validate a partial limits object
+ * @returns {Array<string>} error messages (empty if valid)
+ */
+function validateLimits(changes) {
+    const errors = [];
+
+    if (!changes || typeof changes !== 'object' || Array.isArray(changes)) {
+        return ['Body harus berupa object limits'];
+    }
+
+    for (const [name, value] of Object.entries(changes)) {
+        const range = LIMITS[name];
+        if (!range) {
+            errors.push(`Limit tidak dikenal: ${name}`);
+        } else if (!Number.isInteger(value) || value < range.min || value > range.max) {
+            errors.push(`${name} harus bilangan bulat ${range.min}-${range.max}`);
+        }
+    }
+
+    if (Object.keys(changes).length === 0) {
+        errors.push('Tidak ada limit yang diubah');
+    }
+
+    return errors;
+}
+
+/**
+ * Apply validated limits to a platform's modules
+ * Synchronous - no request can observe a half-applied config.
+ */
+function applyLimits(modules, changes) {
+    modules.downloadQueue.configure({ maxConcurrent: changes.maxConcurrent });
+    modules.rateLimiter.configure({
+        minDelayMs: changes.minDelayMs,
+        maxRequestsPerMinute: changes.maxRequestsPerMinute
+    });
+    modules.browserManager.configure({
+        maxPages: changes.maxPages,
+        maxMemoryMB: changes.maxMemoryMB
+    });
+}
+
+/**
+ * Apply limits saved by the launcher (SERVER_LIMITS env) at startup, before the
+ * server listens, so no request runs with the defaults. Invalid values are
+ * dropped one by one and logged.
+ */
+function applyStartupLimits() {
+    if (!process.env.SERVER_LIMITS) return;
+
+    let saved;
+    try {
+        saved = JSON.parse(process.env.SERVER_LIMITS);
+    } catch (e) {
+        console.error('[Admin] SERVER_LIMITS is not valid JSON - using default limits');
+        return;
+    }
+
+    for (const [platform, changes] of Object.entries(saved || {})) {
+        const modules = PLATFORMS[platform];
+        if (!modules || !changes || typeof changes !== 'object') {
+            console.error(`[Admin] Ignoring saved limits for unknown platform: ${platform}`);
+            continue;
+        }
+
+        const valid = {};
+        for (const [name, value] of Object.entries(changes)) {
+            const errors = validateLimits({ [name]: value });
+            if (errors.length > 0) {
+                console.error(`[Admin] Ignoring saved ${platform} limit: ${errors.join(', ')}`);
+            } else {
+                valid[name] = value;
+            }
+        }
+
+        if (Object.keys(valid).length > 0) {
+            applyLimits(modules, valid);
+            console.log(`[Admin] ${platform} limits from launcher:`, JSON.stringify(getLimits(modules)));
+        }
+    }
+}
+
+applyStartupLimits();
+
+/**
+ * Only local callers; require the launcher token when one was issued
+ * Web pages open in the user's browser also connect from loopback, so requests
+ * with an Origin header (sent by browsers, never by the launcher) are refused,
+ * as are foreign Host names (DNS rebinding).
+ */
+router.use((req, res, next) => {
+    if (!LOOPBACK_ADDRESSES.includes(req.socket.remoteAddress)) {
+        return res.status(403).json({ success: false, error: 'Admin API hanya untuk localhost' });
+    }
+    if (req.get('Origin') || !LOOPBACK_HOSTS.test(req.get('Host') || '')) {
+        return res.status(403).json({ success: false, error: 'Admin API tidak bisa diakses dari browser' });
+    }
+    if (ADMIN_TOKEN && req.get('X-Admin-Token') !== ADMIN_TOKEN) {
+        return res.status(401).json({ success: false, error: 'Admin token tidak valid' });
+    }
+    next();
+});
+
+/**
+ * GET /limits - Current limits for all platforms
+ */
+router.get('/limits', (req, res) => {
+    const limits = {};
+    for (const [platform, modules] of Object.entries(PLATFORMS)) {
+        limits[platform] = getLimits(modules);
+    }
+    res.json({ success: true, limits, ranges: LIMITS });
+});
+
+/**
+ * POST /limits/:platform - Change limits live
+ * Body: any subset of LIMITS, e.g. { "maxConcurrent": 8, "minDelayMs": 500 }
+ * Everything is validated first; either all changes apply or none do.
+ */
+router.post('/limits/:platform', (req, res) => {
+    const modules = PLATFORMS[req.params.platform];
+    if (!modules) {
+        return res.status(404).json({ success: false, error: 'Platform tidak dikenal' });
+    }
+
+    const changes = req.body;
+    const errors = validateLimits(changes);
+    if (errors.length > 0) {
+        return res.status(400).json({ success: false, errors });
+    }
+
+    applyLimits(modules, changes);
+
+    const limits = getLimits(modules);
+    console.log(`[Admin] ${req.params.platform} limits updated:`, JSON.stringify(limits));
+
+    res.json({ success: true, platform: req.params.platform, limits });
+});
+
+module.exports = router;
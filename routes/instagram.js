@@ -15,14 +15,29 @@ const browserManager = require(path.join(IG_PATH, 'browser-manager'));
 const rateLimiter = require(path.join(IG_PATH, 'rate-limiter'));
 const errorRecovery = require(path.join(IG_PATH, 'error-recovery'));
 const downloadQueue = require(path.join(IG_PATH, 'download-queue'));
+const sessionPool = require(path.join(IG_PATH, 'session-pool'));
+const mediaCache = require(path.join(IG_PATH, 'media-cache'));
+const tracer = require(path.join(IG_PATH, 'tracer'));
 
 const COOKIES_PATH = path.join(IG_PATH, 'cookies.json');
 const DEFAULT_DOWNLOAD_FOLDER = process.env.DOWNLOAD_PATH || path.join(require('os').homedir(), 'Downloads', 'Instagram');
 
+let activeRequests = 0; // Single /download and /save requests in flight (batch jobs are in the queue)
+
+/**
+ * Count a request as active until its response is finished or aborted
+ */
+function trackActive(req, res, next) {
+    activeRequests++;
+    res.once('close', () => { activeRequests--; });
+    next();
+}
+
 /**
  * POST /download - Download Instagram media
  */
-router.post('/download', async (req, res) => {
+router.post('/download', trackActive, async (req, res) => {
+    let trace = tracer.NOOP_TRACE;
     try {
         const { url } = req.body;
 
@@ -43,7 +58,9 @@ router.post('/download', async (req, res) => {
         }
 
         console.log('[Instagram] Processing:', url);
-        const result = await scrapeInstagramPost(url);
+        trace = tracer.start('instagram.download', { url });
+        const result = await scrapeInstagramPost(url, trace);
+        trace.end({ success: result.success, code: result.code, count: result.count });
 
         if (result.success) {
             console.log(`[Instagram] Extracted ${result.count} media items`);
@@ -54,6 +71,7 @@ router.post('/download', async (req, res) => {
 
     } catch (error) {
         console.error('[Instagram] Server error:', error);
+        trace.end({ success: false, error: error.message });
         return res.status(500).json({
             success: false,
             error: 'Terjadi kesalahan server. Silakan coba lagi.',
@@ -119,7 +137,8 @@ router.get('/cookie-status', (req, res) => {
             res.json({
                 loggedIn: true,
                 username: userCookie?.value || 'unknown',
-                cookieCount: cookies.length
+                cookieCount: cookies.length,
+                sessionCount: sessionPool.getStats().total
             });
         } else {
             res.json({ loggedIn: false, message: 'No valid session' });
@@ -139,15 +158,16 @@ router.get('/health', (req, res) => {
         timestamp: new Date().toISOString(),
         browser: browserManager.getStats(),
         rateLimit: rateLimiter.getStats(),
-        errors: errorRecovery.getStats()
+        sessions: sessionPool.getStats(),
+        mediaCache: mediaCache.getStats(),
+        errors: errorRecovery.getStats(),
+        latency: tracer.getStats()
     });
 });
 
 /**
  * GET /proxy - Proxy for CORS bypass
- */
-/**
- * GET /proxy - Proxy for CORS bypass
+ * Served from the on-disk media cache when possible (Range + ETag aware)
  */
 router.get('/proxy', async (req, res) => {
     try {
@@ -157,6 +177,10 @@ router.get('/proxy', async (req, res) => {
             return res.status(400).json({ error: 'URL diperlukan' });
         }
 
+        if (mediaCache.serve(req, res, url)) {
+            return;
+        }
+
         const fetch = (await import('node-fetch')).default;
 
         // Prepare headers
@@ -183,15 +207,29 @@ router.get('/proxy', async (req, res) => {
             // Ignore cookie errors
         }
 
-        let response = await fetch(url, { headers });
+        const fetchFull = async () => {
+            let response = await fetch(url, { headers });
 
-        if (!response.ok) {
-            // Retry without specific headers if failed
-            response = await fetch(url, {
-                headers: {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                }
-            });
+            if (!response.ok) {
+                // Retry without specific headers if failed
+                response = await fetch(url, {
+                    headers: {
+                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+                    }
+                });
+            }
+            return response;
+        };
+
+        // Ranged miss (video seek): pass the range upstream, fill the cache in the background
+        const range = req.headers.range;
+        let response = range
+            ? await fetch(url, { headers: { ...headers, 'Range': range } })
+            : await fetchFull();
+
+        if (range && response.status !== 206) {
+            // Upstream ignored or rejected the range - fall back to a full response
+            response = response.ok ? response : await fetchFull();
         }
 
         if (!response.ok) {
@@ -199,9 +237,27 @@ router.get('/proxy', async (req, res) => {
         }
 
         const contentType = response.headers.get('content-type');
+        const contentLength = response.headers.get('content-length');
         res.setHeader('Content-Type', contentType);
         res.setHeader('Content-Disposition', 'inline'); // Changed to inline for preview
         res.setHeader('Cache-Control', 'public, max-age=31536000'); // Cache for 1 year
+        res.setHeader('Accept-Ranges', 'bytes');
+        res.setHeader('X-Cache', 'MISS');
+        if (contentLength) {
+            res.setHeader('Content-Length', contentLength);
+        }
+
+        if (response.status === 206) {
+            res.status(206);
+            res.setHeader('Content-Range', response.headers.get('content-range'));
+            mediaCache.fill(url, fetchFull);
+        } else {
+            if (mediaCache.isCacheableUrl(url)) {
+                res.setHeader('ETag', mediaCache.etagFor(mediaCache.keyFor(url)));
+            }
+            // Store while streaming - the client is not kept waiting for the disk
+            mediaCache.store(url, response.body, contentType, contentLength);
+        }
 
         response.body.pipe(res);
 
@@ -214,7 +270,8 @@ router.get('/proxy', async (req, res) => {
 /**
  * POST /save - Save media to disk
  */
-router.post('/save', async (req, res) => {
+router.post('/save', trackActive, async (req, res) => {
+    let trace = tracer.NOOP_TRACE;
     try {
         const { url, filename, type, username, downloadPath } = req.body;
 
@@ -236,21 +293,24 @@ router.post('/save', async (req, res) => {
             fs.mkdirSync(userFolder, { recursive: true });
         }
 
+        trace = tracer.start('instagram.save', { filename });
         const fetch = (await import('node-fetch')).default;
-        const response = await fetch(url, {
+        const response = await trace.time('download_fetch', () => fetch(url, {
             headers: {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
                 'Referer': 'https://www.instagram.com/'
             }
-        });
+        }));
 
         if (!response.ok) {
+            trace.end({ success: false, status: response.status });
             throw new Error('Failed to download');
         }
 
-        const buffer = await response.arrayBuffer();
+        const buffer = await trace.time('download_body', () => response.arrayBuffer());
         const filePath = path.join(userFolder, filename);
-        fs.writeFileSync(filePath, Buffer.from(buffer));
+        await trace.time('download_write', async () => fs.writeFileSync(filePath, Buffer.from(buffer)));
+        trace.end({ success: true, size: buffer.byteLength });
 
         console.log(`[Instagram] Saved: ${safeUsername}/${filename}`);
 
@@ -264,6 +324,7 @@ router.post('/save', async (req, res) => {
 
     } catch (error) {
         console.error('[Instagram] Save error:', error);
+        trace.end({ success: false, error: error.message }); // No-op if already ended
         res.status(500).json({
             success: false,
             error: 'Gagal menyimpan file: ' + error.message
@@ -323,7 +384,7 @@ router.get('/batch-status/:jobId', (req, res) => {
  * GET /queue-stats - Get download queue stats
  */
 router.get('/queue-stats', (req, res) => {
-    res.json(downloadQueue.getStats());
+    res.json({ ...downloadQueue.getStats(), activeRequests });
 });
 
 module.exports = router;
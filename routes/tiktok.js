@@ -19,10 +19,21 @@ const downloadQueue = require(path.join(TT_PATH, 'download-queue'));
 const COOKIES_PATH = path.join(TT_PATH, 'cookies.json');
 const DEFAULT_DOWNLOAD_FOLDER = process.env.DOWNLOAD_PATH || path.join(require('os').homedir(), 'Downloads', 'TikTok');
 
+let activeRequests = 0; // Single /download and /save requests in flight (batch jobs are in the queue)
+
+/**
+ * Count a request as active until its response is finished or aborted
+ */
+function trackActive(req, res, next) {
+    activeRequests++;
+    res.once('close', () => { activeRequests--; });
+    next();
+}
+
 /**
  * POST /download - Download TikTok media
  */
-router.post('/download', async (req, res) => {
+router.post('/download', trackActive, async (req, res) => {
     try {
         const { url } = req.body;
 
@@ -211,7 +222,7 @@ router.get('/proxy', async (req, res) => {
 /**
  * POST /save-captured - Save captured buffer
  */
-router.post('/save-captured', (req, res) => {
+router.post('/save-captured', trackActive, (req, res) => {
     try {
         const { filename, username } = req.body;
 
@@ -267,7 +278,7 @@ router.get('/download-captured/:filename', (req, res) => {
 /**
  * POST /save - Save media to disk
  */
-router.post('/save', async (req, res) => {
+router.post('/save', trackActive, async (req, res) => {
     console.log('[TikTok] Save request:', req.body.filename || 'no filename');
     try {
         const { url, filename, type, username, downloadPath } = req.body;
@@ -390,7 +401,7 @@ router.get('/batch-status/:jobId', (req, res) => {
  * GET /queue-stats - Get download queue stats
  */
 router.get('/queue-stats', (req, res) => {
-    res.json(downloadQueue.getStats());
+    res.json({ ...downloadQueue.getStats(), activeRequests });
 });
 
 module.exports = router;
@@ -11,10 +11,15 @@ require('dotenv').config();
 const express = require('express');
 const cors = require('cors');
 const path = require('path');
+const Module = require('module');
+const tracer = require('./ProjectDownloaderIG/tracer');
 
 const app = express();
 const PORT = process.env.PORT || 3000;
 
+// Time from process start until the port is bound (reported in /api/health)
+let startupMs = null;
+
 // Middleware
 app.use(cors());
 app.use(express.json({ limit: '10mb' }));
@@ -33,9 +38,11 @@ app.use((req, res, next) => {
 // Mount platform-specific routers
 const instagramRouter = require('./routes/instagram');
 const tiktokRouter = require('./routes/tiktok');
+const adminRouter = require('./routes/admin');
 
 app.use('/api/instagram', instagramRouter);
 app.use('/api/tiktok', tiktokRouter);
+app.use('/api/admin', adminRouter);
 
 // Root status page
 app.get('/', (req, res) => {
@@ -51,7 +58,12 @@ app.get('/api/health', (req, res) => {
         platforms: {
             instagram: '/api/instagram',
             tiktok: '/api/tiktok'
-        }
+        },
+        startup: {
+            readyMs: startupMs,
+            compileCache: Boolean(process.env.NODE_COMPILE_CACHE)
+        },
+        latency: tracer.getStats()
     });
 });
 
@@ -78,6 +90,13 @@ app.use((err, req, res, next) => {
 
 // Start server
 app.listen(PORT, () => {
+    startupMs = Math.round(process.uptime() * 1000);
+
+    // Persist compiled modules now - the launcher may kill us without a clean exit
+    if (process.env.NODE_COMPILE_CACHE && typeof Module.flushCompileCache === 'function') {
+        Module.flushCompileCache();
+    }
+
     console.log(`
 ╔═══════════════════════════════════════════════════════════════╗
 ║         Unified Media Downloader Server Started!              ║
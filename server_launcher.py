@@ -4,7 +4,6 @@ Uses pywebview for native window with HTML/CSS interface
 Premium GUI with frameless window design
 """
 
-import webview
 import subprocess
 import os
 import sys
@@ -12,8 +11,22 @@ import socket
 import threading
 import time
 import base64
+import math
+import json
+import socketserver
+import hashlib
+import shutil
+import secrets
+import urllib.request
+import urllib.error
+import urllib.parse
+import queue
+import argparse
+import multiprocessing
+import concurrent.futures
 
-# Lazy imports for faster startup
+# Lazy imports for faster startup (a second launch only forwards its command)
+webview = None
 Image = None
 ImageDraw = None
 pystray = None
@@ -25,6 +38,63 @@ if getattr(sys, 'frozen', False):
 else:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Per-user data directory (install folder is usually read-only)
+if sys.platform == 'win32':
+    DATA_DIR = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 'MediaDownloaderServer')
+else:
+    DATA_DIR = os.path.join(os.path.expanduser('~'), '.media-downloader-server')
+
+COMPILE_CACHE_ROOT = os.path.join(DATA_DIR, 'compile-cache')
+SETTINGS_PATH = os.path.join(DATA_DIR, 'launcher.json')
+TRACE_DIR = os.path.join(DATA_DIR, 'traces')
+LOCK_PATH = os.path.join(DATA_DIR, 'launcher.lock')
+INSTANCE_PATH = os.path.join(DATA_DIR, 'instance.json')
+THUMBNAIL_DIR = os.path.join(DATA_DIR, 'thumbnails')
+BROWSER_PROFILE_ROOT = os.path.join(DATA_DIR, 'browser-profile')
+
+SERVER_PORT = 3000
+
+# Launcher settings persisted in SETTINGS_PATH
+DEFAULT_SETTINGS = {
+    'onDemand': False,          # Listen on port 3000 and start server.js on first connection
+    'idleTimeoutMinutes': 10,   # Stop server.js after this long without traffic (on-demand mode)
+    'limits': {},               # Per-platform limits, passed to server.js on start (SERVER_LIMITS)
+    'thumbnails': True,         # Generate thumbnails for saved media in the background
+    'thumbnailSize': 320,       # Longest side of a thumbnail in pixels
+    'thumbnailFolders': [],     # Folders to watch (empty = default download folders)
+    'persistentBrowserProfile': True,   # Keep the Instagram browser profile (cache, cookies) between restarts
+    'browserProfileMaxMB': 512,         # Caches are cleared when the profile grows past this
+}
+
+# Token for the server's admin API (only processes started by this launcher know it)
+ADMIN_TOKEN = secrets.token_hex(16)
+
+LIMIT_PLATFORMS = ('instagram', 'tiktok')
+
+# URL host -> server platform (for URLs enqueued from the command line)
+URL_PLATFORMS = {
+    'instagram.com': 'instagram',
+    'tiktok.com': 'tiktok',
+}
+
+# Saved media the thumbnail pipeline handles
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.webm')
+
+THUMBNAIL_SCAN_INTERVAL = 15    # Seconds between folder scans
+THUMBNAIL_SETTLE_SECONDS = 5    # Skip files modified more recently (still being written)
+THUMBNAIL_BATCH_SIZE = 8        # Jobs submitted between download-activity checks
+
+# Files describing the installed dependency tree (compile cache key)
+DEPENDENCY_FILES = [
+    'package-lock.json',
+    os.path.join('node_modules', '.package-lock.json'),
+    os.path.join('ProjectDownloaderIG', 'package-lock.json'),
+    os.path.join('ProjectDownloaderIG', 'node_modules', '.package-lock.json'),
+    os.path.join('ProjectDownloaderTT', 'package-lock.json'),
+    os.path.join('ProjectDownloaderTT', 'node_modules', '.package-lock.json'),
+]
+
 # Load logo as base64 for embedding in HTML
 def get_logo_base64():
     logo_path = os.path.join(BASE_DIR, 'icon', 'cloud.png')
@@ -421,12 +491,109 @@ HTML = """
             background: #059669;
             color: white;
         }
+        
+        /* Limits Panel */
+        .limits-panel {
+            position: fixed;
+            top: 40px;
+            left: 0;
+            right: 0;
+            bottom: 36px;
+            background: #ffffff;
+            padding: 20px 32px;
+            display: none;
+            flex-direction: column;
+            gap: 10px;
+            z-index: 500;
+        }
+        
+        .limits-panel.show {
+            display: flex;
+        }
+        
+        .limits-title {
+            font-size: 16px;
+            font-weight: 700;
+            color: #1e293b;
+            margin-bottom: 4px;
+        }
+        
+        .limit-row {
+            display: flex;
+            align-items: center;
+            justify-content: space-between;
+            padding: 8px 12px;
+            background: #f8fafc;
+            border: 1px solid #e2e8f0;
+            border-radius: 10px;
+        }
+        
+        .limit-row label {
+            font-size: 13px;
+            color: #475569;
+            font-weight: 500;
+        }
+        
+        .limit-row input, .limit-row select {
+            width: 110px;
+            padding: 6px 8px;
+            border: 1px solid #cbd5e1;
+            border-radius: 8px;
+            font-family: inherit;
+            font-size: 13px;
+            text-align: right;
+        }
+        
+        .limits-actions {
+            display: flex;
+            gap: 12px;
+            margin-top: 6px;
+        }
+        
+        .latency-table {
+            width: 100%;
+            border-collapse: collapse;
+            font-size: 12px;
+            color: #475569;
+        }
+        
+        .latency-table th, .latency-table td {
+            padding: 6px 8px;
+            border-bottom: 1px solid #e2e8f0;
+            text-align: right;
+        }
+        
+        .latency-table th:first-child, .latency-table td:first-child {
+            text-align: left;
+        }
+        
+        .latency-table th {
+            color: #1e293b;
+            font-weight: 600;
+        }
+        
+        .latency-scroll {
+            flex: 1;
+            overflow-y: auto;
+        }
+        
+        .btn-secondary {
+            background: #f1f5f9;
+            color: #475569;
+            border: 1px solid #e2e8f0;
+        }
     </style>
 </head>
 <body>
     <!-- Custom Title Bar -->
     <div class="title-bar">
         <div class="window-controls">
+            <button class="window-btn" onclick="openLatency()" title="Latency">
+                <svg viewBox="0 0 24 24"><circle cx="12" cy="13" r="8"/><polyline points="12,9 12,13 15,15"/><line x1="10" y1="2" x2="14" y2="2"/></svg>
+            </button>
+            <button class="window-btn" onclick="openLimits()" title="Limits">
+                <svg viewBox="0 0 24 24"><line x1="4" y1="6" x2="20" y2="6"/><line x1="4" y1="12" x2="20" y2="12"/><line x1="4" y1="18" x2="20" y2="18"/><circle cx="9" cy="6" r="2"/><circle cx="15" cy="12" r="2"/><circle cx="7" cy="18" r="2"/></svg>
+            </button>
             <button class="window-btn minimize" onclick="pywebview.api.minimize_window()" title="Minimize">
                 <svg viewBox="0 0 24 24"><line x1="5" y1="12" x2="19" y2="12"/></svg>
             </button>
@@ -476,6 +643,15 @@ HTML = """
                 <span class="toggle-slider"></span>
             </label>
         </div>
+        
+        <!-- On-demand Toggle -->
+        <div class="toggle-row">
+            <span class="toggle-label">Mode on-demand (hemat memori)</span>
+            <label class="toggle-switch">
+                <input type="checkbox" id="onDemandToggle" onchange="toggleOnDemand(this.checked)">
+                <span class="toggle-slider"></span>
+            </label>
+        </div>
     </div>
     
     <!-- Footer -->
@@ -484,6 +660,58 @@ HTML = """
         <span id="logMsg" class="log-msg">Ready to start</span>
     </div>
     
+    <!-- Limits Panel -->
+    <div id="limitsPanel" class="limits-panel">
+        <div class="limits-title">Limit Server (live)</div>
+        <div class="limit-row">
+            <label for="limitPlatform">Platform</label>
+            <select id="limitPlatform" onchange="renderLimits()">
+                <option value="instagram">Instagram</option>
+                <option value="tiktok">TikTok</option>
+            </select>
+        </div>
+        <div class="limit-row">
+            <label for="maxConcurrent">Download paralel</label>
+            <input type="number" id="maxConcurrent">
+        </div>
+        <div class="limit-row">
+            <label for="maxRequestsPerMinute">Request per menit</label>
+            <input type="number" id="maxRequestsPerMinute">
+        </div>
+        <div class="limit-row">
+            <label for="minDelayMs">Jeda minimum (ms)</label>
+            <input type="number" id="minDelayMs">
+        </div>
+        <div class="limit-row">
+            <label for="maxPages">Tab browser maks</label>
+            <input type="number" id="maxPages">
+        </div>
+        <div class="limit-row">
+            <label for="maxMemoryMB">Memori maks (MB)</label>
+            <input type="number" id="maxMemoryMB">
+        </div>
+        <div class="limits-actions">
+            <button class="btn btn-secondary" onclick="closeLimits()">Tutup</button>
+            <button class="btn btn-start" onclick="applyLimits()">Terapkan</button>
+        </div>
+    </div>
+    
+    <!-- Latency Panel -->
+    <div id="latencyPanel" class="limits-panel">
+        <div class="limits-title">Latensi per Tahap (ms)</div>
+        <div class="latency-scroll">
+            <table class="latency-table">
+                <thead>
+                    <tr><th>Tahap</th><th>n</th><th>p50</th><th>p95</th><th>p99</th></tr>
+                </thead>
+                <tbody id="latencyBody"></tbody>
+            </table>
+        </div>
+        <div class="limits-actions">
+            <button class="btn btn-secondary" onclick="closeLatency()">Tutup</button>
+        </div>
+    </div>
+    
     <!-- Toast -->
     <div id="toast" class="toast"></div>
 
@@ -491,6 +719,7 @@ HTML = """
         let isOnline = false;
         let isStarting = false;
         let isStopping = false;
+        let startupInfo = null;
 
         function updateUI(online) {
             isOnline = online;
@@ -507,7 +736,8 @@ HTML = """
                 text.className = 'status-text online';
                 btnStart.disabled = true;
                 btnStop.disabled = false;
-                logMsg.textContent = 'Server running on port 3000';
+                logMsg.textContent = startupInfo || 'Server running on port 3000';
+                if (!startupInfo) loadStartupInfo();
             } else if (!online && !isStarting) {
                 isStopping = false;
                 dot.className = 'status-dot offline';
@@ -516,6 +746,7 @@ HTML = """
                 btnStart.disabled = false;
                 btnStop.disabled = true;
                 logMsg.textContent = 'Server stopped';
+                startupInfo = null;
             }
         }
 
@@ -571,6 +802,124 @@ HTML = """
             }
         }
 
+        const LIMIT_FIELDS = ['maxConcurrent', 'maxRequestsPerMinute', 'minDelayMs', 'maxPages', 'maxMemoryMB'];
+        let currentLimits = null;
+
+        async function openLimits() {
+            if (!isOnline) {
+                showToast('Jalankan server terlebih dahulu', 'error');
+                return;
+            }
+            const result = await pywebview.api.get_limits();
+            if (!result || !result.success) {
+                showToast((result && result.error) || 'Gagal memuat limit', 'error');
+                return;
+            }
+            currentLimits = result.limits;
+            for (const field of LIMIT_FIELDS) {
+                const range = result.ranges[field];
+                const input = document.getElementById(field);
+                input.min = range.min;
+                input.max = range.max;
+            }
+            renderLimits();
+            document.getElementById('limitsPanel').classList.add('show');
+        }
+
+        function renderLimits() {
+            const platform = document.getElementById('limitPlatform').value;
+            for (const field of LIMIT_FIELDS) {
+                document.getElementById(field).value = currentLimits[platform][field];
+            }
+        }
+
+        function closeLimits() {
+            document.getElementById('limitsPanel').classList.remove('show');
+        }
+
+        async function applyLimits() {
+            const platform = document.getElementById('limitPlatform').value;
+            const limits = {};
+            for (const field of LIMIT_FIELDS) {
+                limits[field] = Number(document.getElementById(field).value);
+            }
+            const result = await pywebview.api.set_limits(platform, limits);
+            if (result && result.success) {
+                currentLimits[platform] = result.limits;
+                showToast('Limit diterapkan tanpa restart', 'success');
+            } else {
+                const errors = (result && (result.errors || [result.error])) || ['Gagal menerapkan limit'];
+                showToast(errors.join(', '), 'error');
+            }
+        }
+
+        let latencyTimer = null;
+
+        async function openLatency() {
+            if (!isOnline) {
+                showToast('Jalankan server terlebih dahulu', 'error');
+                return;
+            }
+            document.getElementById('latencyPanel').classList.add('show');
+            refreshLatency();
+        }
+
+        async function refreshLatency() {
+            const result = await pywebview.api.get_latency();
+            if (!result || !result.success) {
+                showToast((result && result.error) || 'Gagal memuat latensi', 'error');
+                return;
+            }
+
+            const body = document.getElementById('latencyBody');
+            body.innerHTML = '';
+            const stages = Object.entries(result.stages);
+            if (stages.length === 0) {
+                const message = result.sleeping ? 'Server sedang tidur (on-demand)' : 'Belum ada request';
+                body.innerHTML = '<tr><td colspan="5">' + message + '</td></tr>';
+            }
+            for (const [stage, stats] of stages) {
+                const row = document.createElement('tr');
+                for (const value of [stage, stats.count, stats.p50, stats.p95, stats.p99]) {
+                    const cell = document.createElement('td');
+                    cell.textContent = value;
+                    row.appendChild(cell);
+                }
+                body.appendChild(row);
+            }
+            if (document.getElementById('latencyPanel').classList.contains('show')) {
+                latencyTimer = setTimeout(refreshLatency, 3000);
+            }
+        }
+
+        function closeLatency() {
+            clearTimeout(latencyTimer);
+            document.getElementById('latencyPanel').classList.remove('show');
+        }
+
+        async function toggleOnDemand(enabled) {
+            const result = await pywebview.api.set_on_demand(enabled);
+            let message = enabled ? 'Mode on-demand diaktifkan' : 'Mode on-demand dinonaktifkan';
+            if (result && result.restartRequired) {
+                message += ' (berlaku setelah restart server)';
+            }
+            showToast(message, enabled ? 'success' : 'error');
+        }
+
+        async function loadSettings() {
+            const current = await pywebview.api.get_settings();
+            document.getElementById('onDemandToggle').checked = !!(current && current.onDemand);
+        }
+
+        async function loadStartupInfo() {
+            const stats = await pywebview.api.get_startup_stats();
+            if (!stats || !stats.readyMs) return;
+            startupInfo = 'Ready in ' + stats.readyMs + 'ms';
+            if (stats.savedMs > 0) {
+                startupInfo += ' (cache -' + stats.savedMs + 'ms)';
+            }
+        }
+
         async function toggleAutoRestart(enabled) {
             await pywebview.api.toggle_auto_restart(enabled);
             showToast(enabled ? 'Auto-restart diaktifkan' : 'Auto-restart dinonaktifkan', enabled ? 'success' : 'error');
@@ -593,7 +942,10 @@ HTML = """
             setTimeout(checkStatus, 2000);
         }
 
-        window.addEventListener('pywebviewready', checkStatus);
+        window.addEventListener('pywebviewready', () => {
+            loadSettings();
+            checkStatus();
+        });
     </script>
 </body>
 </html>
@@ -602,24 +954,15 @@ HTML = """
 class Api:
     def check_status(self):
         """Check if server is running on port 3000"""
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex(('127.0.0.1', 3000))
-            sock.close()
-            return result == 0
-        except:
-            return False
+        return server_is_up()
 
     def start_server(self):
         """Start the Node.js server using bundled or system Node.js"""
+        global server_process
         try:
-            # Check for bundled Node.js first
+            # Bundled Node.js first, else system Node.js (see get_node_command)
             bundled_node = os.path.join(BASE_DIR, 'nodejs', 'node.exe')
-            if os.path.exists(bundled_node):
-                node_cmd = f'"{bundled_node}"'
-            else:
-                # Fallback to system Node.js
+            if not os.path.exists(bundled_node):
                 node_check = subprocess.run(
                     'node --version',
                     shell=True,
@@ -628,7 +971,6 @@ class Api:
                 )
                 if node_check.returncode != 0:
                     return {'success': False, 'error': 'Node.js tidak ditemukan! Pastikan nodejs folder ada atau install Node.js.'}
-                node_cmd = 'node'
             
             server_file = os.path.join(BASE_DIR, 'server.js')
             if not os.path.exists(server_file):
@@ -638,40 +980,33 @@ class Api:
             if not os.path.exists(node_modules):
                 return {'success': False, 'error': 'Folder node_modules tidak ditemukan! Jalankan npm install terlebih dahulu.'}
             
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            port_check = sock.connect_ex(('127.0.0.1', 3000))
-            sock.close()
-            if port_check == 0:
+            if server_is_up():
                 return {'success': False, 'error': 'Port 3000 sudah digunakan!'}
             
-            # Prepare command as list for shell=False (better for paths with spaces)
-            if os.path.exists(bundled_node):
-                cmd_args = [bundled_node, 'server.js']
-            else:
-                cmd_args = ['node', 'server.js']
+            if settings['onDemand']:
+                start_on_demand_proxy()
+                return {'success': True, 'message': 'Mode on-demand aktif!'}
             
-            subprocess.Popen(
-                cmd_args,
-                shell=False,
-                cwd=BASE_DIR,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            )
+            server_process = spawn_server()
             return {'success': True, 'message': 'Server berhasil dijalankan!'}
             
         except Exception as e:
             return {'success': False, 'error': f'Terjadi kesalahan: {str(e)}'}
 
+    def get_startup_stats(self):
+        """Get readiness timing of the last server start"""
+        return startup_stats
+
     def stop_server(self):
         """Stop the Node.js server"""
+        global on_demand_proxy
         try:
-            result = subprocess.run(
-                'taskkill /F /IM node.exe',
-                shell=True,
-                capture_output=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            )
-            if result.returncode == 0:
+            if on_demand_proxy:
+                on_demand_proxy.stop()
+                on_demand_proxy = None
+                return {'success': True, 'message': 'Server berhasil dihentikan!'}
+            
+            if stop_server_process():
                 return {'success': True, 'message': 'Server berhasil dihentikan!'}
             else:
                 return {'success': False, 'error': 'Tidak ada proses server yang berjalan.'}
@@ -698,6 +1033,47 @@ class Api:
         global auto_restart_enabled
         return auto_restart_enabled
 
+    def get_settings(self):
+        """Get launcher settings"""
+        return settings
+
+    def set_on_demand(self, enabled):
+        """Toggle on-demand (scale-to-zero) mode, applied on next start"""
+        settings['onDemand'] = bool(enabled)
+        save_settings()
+        return {'success': True, 'enabled': settings['onDemand'], 'restartRequired': server_is_up()}
+
+    def get_limits(self):
+        """Get current server limits (and allowed ranges)"""
+        return admin_request('GET', '/limits')
+
+    def set_limits(self, platform, limits):
+        """Change server limits live and remember them for the next start"""
+        if platform not in LIMIT_PLATFORMS:
+            return {'success': False, 'error': 'Platform tidak dikenal'}
+        
+        result = admin_request('POST', f'/limits/{platform}', limits)
+        if result.get('success'):
+            settings['limits'][platform] = result['limits']
+            save_settings()
+        return result
+
+    def get_latency(self):
+        """Get per-stage latency percentiles from the server's health check
+        In on-demand mode the backend is queried directly, so polling never wakes it
+        """
+        port = SERVER_PORT
+        if on_demand_proxy:
+            if not on_demand_proxy.is_backend_running():
+                return {'success': True, 'stages': {}, 'sleeping': True}
+            port = on_demand_proxy.backend_port
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=5) as response:
+                health = json.load(response)
+            return {'success': True, 'stages': health.get('latency', {}).get('stages', {})}
+        except (OSError, ValueError) as e:
+            return {'success': False, 'error': f'Gagal memuat latensi: {str(e)}'}
+
     def set_server_should_run(self, should_run):
         """Set flag indicating if server should be running"""
         global server_should_run
@@ -716,9 +1092,1086 @@ class Api:
         if window:
             window.hide()
 
+class TokenBucket:
+    """Token bucket with reservation semantics (same algorithm as rate-limiter.js)"""
+
+    def __init__(self):
+        self.tokens = None
+        self.updated_at = 0
+        self.last_grant_at = 0
+        self.grants = 0
+
+    def reserve(self, now, config, cooldown_until=0):
+        """Reserve one token, return ms to wait before using it"""
+        capacity = max(1, config['burstSize'])
+        rate_per_ms = config['maxRequestsPerMinute'] / 60000.0
+
+        if self.tokens is None:
+            self.tokens = capacity
+            self.updated_at = now
+
+        start = max(now, self.updated_at)
+        tokens = min(capacity, self.tokens + (start - self.updated_at) * rate_per_ms)
+
+        earliest = max(start, cooldown_until, self.last_grant_at + config['minDelayMs'] if self.last_grant_at else 0)
+        tokens = min(capacity, tokens + (earliest - start) * rate_per_ms)
+        start = earliest
+
+        if tokens < 1:
+            start += math.ceil((1 - tokens) / rate_per_ms)
+            tokens = 1
+
+        self.tokens = tokens - 1
+        self.updated_at = start
+        self.last_grant_at = start
+        self.grants += 1
+
+        return start - now
+
+    def release(self):
+        """Hand back a token whose reservation the client did not use"""
+        if self.tokens is not None and self.grants > 0:
+            self.tokens += 1
+            self.grants -= 1
+
+
+def clean_rate_config(config):
+    """Rate config from a client, validated and clamped to sane ranges"""
+    if not isinstance(config, dict):
+        raise ValueError('config must be an object')
+    values = {}
+    for name, low, high in (('maxRequestsPerMinute', 1, 600), ('burstSize', 1, 100), ('minDelayMs', 0, 600000)):
+        value = float(config[name])
+        if not math.isfinite(value):
+            raise ValueError(f'{name} must be a finite number')
+        values[name] = min(max(value, low), high)
+    values['burstSize'] = int(values['burstSize'])
+    return values
+
+
+class RateCoordinator:
+    """Shared rate budget for every server process, served over a local socket"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.cooldowns = {}
+        self.server = None
+        self.address = None
+
+    def handle_message(self, message):
+        """Handle one newline-delimited JSON request"""
+        op = message.get('op')
+        now = time.time() * 1000
+
+        with self.lock:
+            if op == 'reserve':
+                key = message['key']
+                account = message.get('account', 'anonymous')
+                config = clean_rate_config(message['config'])
+                bucket = self.buckets.setdefault(key, TokenBucket())
+                wait_ms = bucket.reserve(now, config, self.cooldowns.get(account, 0))
+                return {'id': message.get('id'), 'waitMs': wait_ms}
+
+            if op == 'release':
+                bucket = self.buckets.get(message['key'])
+                if bucket:
+                    bucket.release()
+                return {'id': message.get('id'), 'ok': True}
+
+            if op == 'cooldown':
+                account = message.get('account', 'anonymous')
+                duration_ms = float(message.get('durationMs', 30000))
+                if not math.isfinite(duration_ms):
+                    raise ValueError('durationMs must be a finite number')
+                until = now + min(max(duration_ms, 0), 60 * 60 * 1000)
+                self.cooldowns[account] = max(until, self.cooldowns.get(account, 0))
+                return {'id': message.get('id'), 'ok': True}
+
+            if op == 'stats':
+                return {
+                    'id': message.get('id'),
+                    'buckets': {key: {'grants': b.grants} for key, b in self.buckets.items()},
+                    'cooldowns': {a: until for a, until in self.cooldowns.items() if until > now}
+                }
+
+        return {'id': message.get('id'), 'error': f'Unknown op: {op}'}
+
+    def start(self):
+        """Listen on a Unix socket (or loopback TCP on Windows)"""
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    message = None
+                    try:
+                        message = json.loads(line)
+                        response = coordinator.handle_message(message)
+                    except Exception as e:
+                        # One bad message must not drop the connection
+                        request_id = message.get('id') if isinstance(message, dict) else None
+                        response = {'id': request_id, 'error': f'{type(e).__name__}: {e}'}
+                    self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+        if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, 'rate.sock')
+            if os.path.exists(path):
+                os.unlink(path)
+            self.server = socketserver.ThreadingUnixStreamServer(path, Handler)
+            os.chmod(path, 0o600)
+            self.address = path
+        else:
+            self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+            self.address = f'tcp://127.0.0.1:{self.server.server_address[1]}'
+
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"[Rate Coordinator] Listening on {self.address}")
+
+
+class InstanceLock:
+    """Single-instance lock; the OS releases it if the launcher dies"""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def acquire(self):
+        """Try to take the lock without waiting"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        handle = open(self.path, 'a+')
+        try:
+            if sys.platform == 'win32':
+                import msvcrt
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self.handle = handle
+        return True
+
+
+class CommandServer:
+    """Local channel a second launch uses to hand its command to this instance"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.token = secrets.token_hex(16)
+        self.server = None
+        self.address = None
+
+    def start(self):
+        """Listen on a Unix socket (or loopback TCP on Windows) and publish the address"""
+        command_server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                try:
+                    message = json.loads(line)
+                    if not secrets.compare_digest(str(message.get('token', '')), command_server.token):
+                        response = {'ok': False, 'error': 'Invalid token'}
+                    else:
+                        response = command_server.handler(message)
+                except (ValueError, KeyError, TypeError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+        if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+            path = os.path.join(DATA_DIR, 'launcher.sock')
+            if os.path.exists(path):
+                os.unlink(path)  # Stale - we hold the instance lock
+            self.server = socketserver.ThreadingUnixStreamServer(path, Handler)
+            os.chmod(path, 0o600)
+            self.address = path
+        else:
+            self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+            self.address = f'tcp://127.0.0.1:{self.server.server_address[1]}'
+
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        # Token file is private to this user, so only they can send commands
+        tmp_path = INSTANCE_PATH + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'address': self.address, 'token': self.token, 'pid': os.getpid()}, f)
+        if sys.platform != 'win32':
+            os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, INSTANCE_PATH)
+        print(f"[Single Instance] Command channel on {self.address}")
+
+
+
+def get_node_command():
+    """Command to run server.js with bundled or system Node.js"""
+    bundled_node = os.path.join(BASE_DIR, 'nodejs', 'node.exe')
+    if os.path.exists(bundled_node):
+        return [bundled_node, 'server.js']
+    return ['node', 'server.js']
+
+def server_is_up():
+    """Whether the server answers on port 3000
+    In on-demand mode port 3000 belongs to the proxy, and any connection to it
+    starts server.js - so the proxy's own state is reported instead of probing.
+    """
+    if on_demand_proxy:
+        return on_demand_proxy.running
+    return is_server_port_open()
+
+def is_server_port_open(port=SERVER_PORT):
+    """Check if something is listening on the given port"""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(1)
+        result = sock.connect_ex(('127.0.0.1', port))
+        sock.close()
+        return result == 0
+    except OSError:
+        return False
+
+def get_node_version():
+    """Node.js version string (cached after first call)"""
+    global node_version
+    if node_version is None:
+        try:
+            result = subprocess.run(
+                [get_node_command()[0], '--version'],
+                capture_output=True,
+                text=True,
+                timeout=10,
+                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+            )
+            node_version = result.stdout.strip() or 'unknown'
+        except (OSError, subprocess.SubprocessError):
+            node_version = 'unknown'
+    return node_version
+
+def compile_cache_supported(version):
+    """NODE_COMPILE_CACHE is honoured from Node.js 22.1, but server.js can only
+    flush it (module.flushCompileCache) from 22.10 - the launcher stops the server
+    with a hard kill, so on older versions the cache would never be written"""
+    try:
+        major, minor = (int(part) for part in version.lstrip('v').split('.')[:2])
+    except ValueError:
+        return False
+    return (major, minor) >= (22, 10)
+
+def get_dependency_hash():
+    """Hash of lockfiles so the cache is dropped when dependencies change"""
+    digest = hashlib.sha256()
+    for rel_path in DEPENDENCY_FILES:
+        full_path = os.path.join(BASE_DIR, rel_path)
+        if os.path.exists(full_path):
+            digest.update(rel_path.encode('utf-8'))
+            with open(full_path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def prepare_compile_cache():
+    """Return the compile cache dir for this Node version + dependency tree"""
+    version = get_node_version()
+    if not compile_cache_supported(version):
+        return None
+
+    key = f'{version}-{get_dependency_hash()}'
+    cache_dir = os.path.join(COMPILE_CACHE_ROOT, key)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Anything not matching the current key is stale
+        for name in os.listdir(COMPILE_CACHE_ROOT):
+            if name != key:
+                shutil.rmtree(os.path.join(COMPILE_CACHE_ROOT, name), ignore_errors=True)
+    except OSError as e:
+        print(f"[Compile Cache] Disabled: {e}")
+        return None
+    return cache_dir
+
+def record_startup_time(cache_dir, ready_ms):
+    """Store readiness timing and compare it with the cold (empty cache) start"""
+    global startup_stats
+    stats = {'readyMs': ready_ms, 'compileCache': cache_dir is not None}
+    if not cache_dir:
+        startup_stats = stats
+        return
+
+    timings_path = os.path.join(cache_dir, 'startup.json')
+    try:
+        with open(timings_path, 'r', encoding='utf-8') as f:
+            timings = json.load(f)
+    except (OSError, ValueError):
+        timings = {}
+
+    if 'coldMs' not in timings:
+        timings['coldMs'] = ready_ms
+    timings['lastMs'] = ready_ms
+    timings['runs'] = timings.get('runs', 0) + 1
+
+    stats['coldMs'] = timings['coldMs']
+    stats['savedMs'] = max(0, timings['coldMs'] - ready_ms) if timings['runs'] > 1 else 0
+    startup_stats = stats
+
+    try:
+        with open(timings_path, 'w', encoding='utf-8') as f:
+            json.dump(timings, f)
+    except OSError:
+        pass
+
+def wait_for_ready(process, cache_dir, started_at, port=SERVER_PORT):
+    """Poll until server.js binds its port and record how long it took"""
+    while process.poll() is None and time.time() - started_at < 60:
+        if is_server_port_open(port):
+            ready_ms = int((time.time() - started_at) * 1000)
+            record_startup_time(cache_dir, ready_ms)
+            saved = startup_stats.get('savedMs', 0)
+            print(f"[Startup] Server ready in {ready_ms}ms (compile cache saved {saved}ms)")
+            return
+        time.sleep(0.05)
+
+def spawn_server(port=None):
+    """Start server.js with launcher-provided environment"""
+    env = os.environ.copy()
+    env['ADMIN_TOKEN'] = ADMIN_TOKEN
+    if port:
+        env['PORT'] = str(port)
+    if rate_coordinator and rate_coordinator.address:
+        env['RATE_COORDINATOR'] = rate_coordinator.address
+    env.setdefault('TRACE_DIR', TRACE_DIR)
+    env['SERVER_LIMITS'] = json.dumps(saved_limits())
+    env.setdefault('MEDIA_CACHE_DIR', os.path.join(DATA_DIR, 'media-cache'))
+    if settings['persistentBrowserProfile']:
+        env['BROWSER_PROFILE_DIR'] = os.path.join(BROWSER_PROFILE_ROOT, 'instagram')
+        env['BROWSER_PROFILE_MAX_MB'] = str(settings['browserProfileMaxMB'])
+
+    cache_dir = prepare_compile_cache()
+    if cache_dir:
+        env['NODE_COMPILE_CACHE'] = cache_dir
+
+    started_at = time.time()
+
+    # Command as list for shell=False (better for paths with spaces)
+    process = subprocess.Popen(
+        get_node_command(),
+        shell=False,
+        cwd=BASE_DIR,
+        env=env,
+        creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+    )
+
+    threading.Thread(target=wait_for_ready, args=(process, cache_dir, started_at, port or SERVER_PORT), daemon=True).start()
+    return process
+
+def api_request(method, path, body=None, port=SERVER_PORT, timeout=5, headers=None):
+    """Call a JSON endpoint of the local server"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(
+        f'http://127.0.0.1:{port}{path}',
+        data=data,
+        method=method,
+        headers={'Content-Type': 'application/json', **(headers or {})}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        try:
+            return json.load(e)
+        except ValueError:
+            return {'success': False, 'error': f'HTTP {e.code}'}
+    except (OSError, ValueError) as e:
+        return {'success': False, 'error': str(e)}
+
+def admin_request(method, path, body=None, port=SERVER_PORT):
+    """Call the server's local admin API"""
+    return api_request(method, f'/api/admin{path}', body, port, headers={'X-Admin-Token': ADMIN_TOKEN})
+
+def saved_limits():
+    """Limits changed in the launcher, for server.js to apply before it listens
+    Values that are not integers are dropped here; server.js checks the ranges
+    and logs anything it rejects.
+    """
+    saved = settings['limits'] if isinstance(settings['limits'], dict) else {}
+    limits = {}
+    for platform, values in saved.items():
+        if platform not in LIMIT_PLATFORMS or not isinstance(values, dict):
+            print(f"[Limits] Ignoring saved limits for {platform!r}")
+            continue
+        clean = {}
+        for name, value in values.items():
+            if isinstance(value, int) and not isinstance(value, bool):
+                clean[name] = value
+            else:
+                print(f"[Limits] Ignoring saved {platform} limit {name}={value!r} (not an integer)")
+        if clean:
+            limits[platform] = clean
+    return limits
+
+def kill_process_tree(process):
+    """Stop server.js together with the Chrome it launched"""
+    if process.poll() is not None:
+        return
+    if sys.platform == 'win32':
+        subprocess.run(
+            ['taskkill', '/F', '/T', '/PID', str(process.pid)],
+            capture_output=True,
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+    else:
+        # SIGTERM lets browser-manager.js close Chrome cleanly
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def stop_server_process():
+    """Stop the server started by this launcher, or any leftover node.exe with its children
+    Returns True if a server was stopped
+    """
+    global server_process
+    if server_process and server_process.poll() is None:
+        kill_process_tree(server_process)
+        server_process = None
+        return True
+    server_process = None
+
+    # Server from an earlier launcher run - /T also ends the Chrome it started,
+    # which would otherwise keep the browser profile locked
+    result = subprocess.run(
+        'taskkill /F /T /IM node.exe',
+        shell=True,
+        capture_output=True,
+        creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+    )
+    return result.returncode == 0
+
+def find_free_port():
+    """Ask the OS for an unused loopback port"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def downloads_active(port=SERVER_PORT):
+    """Check the server for queued or running downloads, single saves and scrapes"""
+    for platform in LIMIT_PLATFORMS:
+        url = f'http://127.0.0.1:{port}/api/{platform}/queue-stats'
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                stats = json.load(response)
+            if stats.get('queueLength') or stats.get('activeDownloads') or stats.get('activeRequests'):
+                return True
+        except (OSError, ValueError):
+            pass
+    return False
+
+def server_downloads_active():
+    """Downloads running right now (never wakes an on-demand backend)"""
+    if on_demand_proxy:
+        if not on_demand_proxy.is_backend_running():
+            return False
+        return downloads_active(on_demand_proxy.backend_port)
+    if not is_server_port_open():
+        return False
+    return downloads_active()
+
+def load_settings():
+    """Load launcher settings, falling back to defaults"""
+    loaded = json.loads(json.dumps(DEFAULT_SETTINGS))
+    try:
+        with open(SETTINGS_PATH, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        loaded.update({key: value for key, value in stored.items() if key in DEFAULT_SETTINGS})
+    except (OSError, ValueError):
+        pass
+    return loaded
+
+def save_settings():
+    """Persist launcher settings"""
+    try:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with open(SETTINGS_PATH, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, indent=2)
+    except OSError as e:
+        print(f"[Settings] Failed to save: {e}")
+
+
+class OnDemandProxy:
+    """Own port 3000 and run server.js only while there is traffic"""
+
+    def __init__(self, idle_timeout):
+        self.idle_timeout = idle_timeout
+        self.listener = None
+        self.process = None
+        self.backend_port = None
+        self.running = False
+        self.lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.busy = {}
+        self.last_activity = time.time()
+        self.accept_thread = None
+
+    def start(self):
+        """Bind port 3000 and begin accepting connections"""
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if sys.platform != 'win32':
+            # On Windows SO_REUSEADDR would allow two listeners on the same port
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(('', SERVER_PORT))
+        self.listener.listen(64)
+        self.running = True
+
+        self.accept_thread = threading.Thread(target=self.accept_loop, daemon=True)
+        self.accept_thread.start()
+        threading.Thread(target=self.idle_loop, daemon=True).start()
+        print(f"[On-Demand] Listening on port {SERVER_PORT}, idle timeout {self.idle_timeout}s")
+
+    def stop(self):
+        """Stop listening and stop server.js"""
+        self.running = False
+        if self.listener:
+            # close() alone does not wake a thread blocked in accept() on Linux
+            try:
+                self.listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            try:
+                self.listener.close()
+            except OSError:
+                pass
+        if self.accept_thread and self.accept_thread is not threading.current_thread():
+            self.accept_thread.join(timeout=5)
+        self.stop_backend()
+
+    def is_backend_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def ensure_backend(self):
+        """Start server.js if needed and wait until it accepts connections"""
+        with self.start_lock:
+            if not self.running:
+                return False
+            if self.is_backend_running() and is_server_port_open(self.backend_port):
+                return True
+
+            if not self.is_backend_running():
+                self.backend_port = find_free_port()
+                print(f"[On-Demand] Connection received - starting server on port {self.backend_port}")
+                self.process = spawn_server(port=self.backend_port)
+
+            deadline = time.time() + 60
+            while time.time() < deadline and self.is_backend_running():
+                if is_server_port_open(self.backend_port):
+                    return True
+                time.sleep(0.05)
+
+            print("[On-Demand] Server failed to start")
+            return False
+
+    def stop_backend(self):
+        """Stop server.js (next connection starts it again)"""
+        with self.start_lock:
+            if self.process:
+                kill_process_tree(self.process)
+                self.process = None
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                break
+            if not self.running:
+                client.close()
+                break
+            threading.Thread(target=self.handle_client, args=(client,), daemon=True).start()
+
+    def handle_client(self, client):
+        """Proxy one client connection to server.js"""
+        if not self.running:
+            # Stopping - never start a backend nobody will stop
+            try:
+                client.close()
+            except OSError:
+                pass
+            return
+
+        # Connection is held open (kernel backlog + this socket) while the backend boots
+        state = {'lastRequest': time.time(), 'lastResponse': 0}
+        with self.lock:
+            self.busy[id(state)] = True
+            self.last_activity = time.time()
+
+        backend = None
+        try:
+            if not self.ensure_backend():
+                return
+            backend = socket.create_connection(('127.0.0.1', self.backend_port), timeout=10)
+            backend.settimeout(None)
+
+            upstream = threading.Thread(
+                target=self.pipe, args=(client, backend, state, 'lastRequest'), daemon=True
+            )
+            upstream.start()
+            self.pipe(backend, client, state, 'lastResponse')
+            upstream.join()
+        except OSError:
+            pass
+        finally:
+            for sock in (client, backend):
+                if sock:
+                    try:
+                        sock.close()
+                    except OSError:
+                        pass
+            with self.lock:
+                self.busy.pop(id(state), None)
+                self.last_activity = time.time()
+
+    def pipe(self, source, dest, state, stamp):
+        """Copy bytes one way, tracking whether a request is waiting on a response"""
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                dest.sendall(data)
+                now = time.time()
+                state[stamp] = now
+                with self.lock:
+                    self.last_activity = now
+                    # Request bytes newer than response bytes = request in flight
+                    if state['lastRequest'] > state['lastResponse']:
+                        self.busy[id(state)] = True
+                    else:
+                        self.busy.pop(id(state), None)
+        except OSError:
+            pass
+        finally:
+            try:
+                dest.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    def has_background_work(self):
+        """Batch downloads keep running after their HTTP request returned"""
+        return downloads_active(self.backend_port)
+
+    def idle_loop(self):
+        """Stop server.js after idle_timeout seconds without traffic"""
+        while self.running:
+            time.sleep(5)
+            if not self.is_backend_running():
+                continue
+            with self.lock:
+                idle_for = time.time() - self.last_activity
+                busy = bool(self.busy)
+            if busy or idle_for < self.idle_timeout:
+                continue
+            if self.has_background_work():
+                continue
+            print(f"[On-Demand] Idle for {int(idle_for)}s - stopping server")
+            self.stop_backend()
+
+def lower_worker_priority():
+    """Thumbnail workers run below normal priority so downloads and the UI win"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            ctypes.windll.kernel32.SetPriorityClass(ctypes.windll.kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(10)
+    except (OSError, AttributeError):
+        pass
+
+def render_thumbnail(source, dest, size, ffmpeg=None):
+    """Write a JPEG thumbnail of an image or video (runs in a worker process)"""
+    tmp_path = f'{dest}.tmp-{os.getpid()}'
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+    if source.lower().endswith(VIDEO_EXTENSIONS):
+        if not ffmpeg:
+            return False
+        # Frame at 1s (skips black intro frames), first frame for very short clips
+        for seek in ('1', '0'):
+            result = subprocess.run(
+                [ffmpeg, '-v', 'error', '-ss', seek, '-i', source, '-frames:v', '1',
+                 '-vf', f'scale={size}:{size}:force_original_aspect_ratio=decrease',
+                 '-f', 'image2', '-y', tmp_path],
+                capture_output=True,
+                timeout=60,
+                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+            )
+            if result.returncode == 0 and os.path.exists(tmp_path) and os.path.getsize(tmp_path) > 0:
+                os.replace(tmp_path, dest)
+                return True
+        return False
+
+    from PIL import Image as PILImage, ImageOps
+    try:
+        with PILImage.open(source) as image:
+            # JPEG: let the decoder downscale instead of decoding full size
+            image.draft('RGB', (size, size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            image.convert('RGB').save(tmp_path, 'JPEG', quality=80, optimize=True)
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+class ThumbnailPipeline:
+    """Watch download folders and generate thumbnails in a background process pool"""
+
+    def __init__(self, folders, size):
+        self.folders = folders
+        self.size = size
+        self.index_path = os.path.join(THUMBNAIL_DIR, 'index.json')
+        self.index = {}  # source path -> {mtimeNs, size, key, thumbnail}, only once the thumbnail exists
+        self.failed = {}  # source path -> (mtimeNs, size) of a version that failed to render
+        self.ffmpeg = shutil.which('ffmpeg')
+        self.workers = max(1, (os.cpu_count() or 2) // 2)
+        self.running = False
+        self.stats = {'generated': 0, 'failed': 0, 'skippedWhileBusy': 0}
+
+    def start(self):
+        self.running = True
+        self.load_index()
+        threading.Thread(target=self.scan_loop, daemon=True).start()
+        print(f"[Thumbnails] Watching {', '.join(self.folders)} ({self.workers} workers{', ffmpeg' if self.ffmpeg else ', no ffmpeg - images only'})")
+
+    def stop(self):
+        self.running = False
+
+    def load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def save_index(self):
+        try:
+            os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"[Thumbnails] Failed to save index: {e}")
+
+    def content_key(self, path, file_size):
+        """Hash of size + first and last 64KB (plus thumbnail size): same content, same thumbnail"""
+        digest = hashlib.sha256(f'{file_size}:{self.size}:'.encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read(65536))
+            if file_size > 131072:
+                f.seek(-65536, os.SEEK_END)
+                digest.update(f.read(65536))
+        return digest.hexdigest()[:32]
+
+    def thumbnail_path(self, key):
+        return os.path.join(THUMBNAIL_DIR, key[:2], f'{key}.jpg')
+
+    def list_media(self):
+        """Media files in the watched folders with their stat results"""
+        supported = IMAGE_EXTENSIONS + (VIDEO_EXTENSIONS if self.ffmpeg else ())
+        found = {}
+        for folder in self.folders:
+            for root, dirs, files in os.walk(folder):
+                for name in files:
+                    if name.lower().endswith(supported):
+                        path = os.path.join(root, name)
+                        try:
+                            found[path] = os.stat(path)
+                        except OSError:
+                            pass
+        return found
+
+    def scan(self):
+        """Update the index; return (source, key, entry) tuples that need a thumbnail"""
+        now = time.time()
+        pending = []
+        queued = set()  # Identical files (e.g. saved twice) share one thumbnail
+        media = self.list_media()
+
+        for path, st in media.items():
+            entry = self.index.get(path)
+            if (entry and entry['mtimeNs'] == st.st_mtime_ns and entry['size'] == st.st_size
+                    and os.path.exists(entry['thumbnail'])):
+                continue  # Unchanged since last scan
+            if self.failed.get(path) == (st.st_mtime_ns, st.st_size):
+                continue  # Failed before - retried once the file changes
+            if now - st.st_mtime < THUMBNAIL_SETTLE_SECONDS:
+                continue  # Still being written - next scan
+            try:
+                key = self.content_key(path, st.st_size)
+            except OSError:
+                continue
+
+            entry = {'mtimeNs': st.st_mtime_ns, 'size': st.st_size, 'key': key, 'thumbnail': self.thumbnail_path(key)}
+            if os.path.exists(entry['thumbnail']):
+                self.index[path] = entry
+            elif key not in queued:
+                # Indexed only after the render succeeds (failed or interrupted renders are retried)
+                queued.add(key)
+                pending.append((path, key, entry))
+
+        # Deleted sources: drop their entries and unreferenced thumbnails
+        removed = [path for path in self.index if path not in media]
+        if removed:
+            live_keys = {entry['key'] for path, entry in self.index.items() if path in media}
+            for path in removed:
+                key = self.index.pop(path)['key']
+                if key not in live_keys:
+                    try:
+                        os.remove(self.thumbnail_path(key))
+                    except OSError:
+                        pass
+
+        return pending
+
+    def wait_until_quiet(self):
+        """Hold off while the server is downloading"""
+        while self.running and server_downloads_active():
+            self.stats['skippedWhileBusy'] += 1
+            time.sleep(5)
+
+    def generate(self, pending):
+        """Render pending thumbnails in a process pool, a small batch at a time"""
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=lower_worker_priority)
+        try:
+            for start in range(0, len(pending), THUMBNAIL_BATCH_SIZE):
+                self.wait_until_quiet()
+                if not self.running:
+                    break
+                batch = pending[start:start + THUMBNAIL_BATCH_SIZE]
+                futures = {
+                    pool.submit(render_thumbnail, path, entry['thumbnail'], self.size, self.ffmpeg): (path, entry)
+                    for path, key, entry in batch
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    path, entry = futures[future]
+                    try:
+                        ok = future.result()
+                    except Exception as e:
+                        print(f"[Thumbnails] {os.path.basename(path)}: {e}")
+                        ok = False
+                    if ok:
+                        self.index[path] = entry
+                    else:
+                        self.failed[path] = (entry['mtimeNs'], entry['size'])
+                    self.stats['generated' if ok else 'failed'] += 1
+        finally:
+            # Workers exit between scans so idle launchers don't keep them in memory
+            pool.shutdown(wait=True)
+
+    def scan_loop(self):
+        while self.running:
+            try:
+                pending = self.scan()
+                if pending:
+                    print(f"[Thumbnails] Generating {len(pending)} thumbnails")
+                    self.generate(pending)
+                self.save_index()
+            except Exception as e:
+                print(f"[Thumbnails] Scan failed: {e}")
+            time.sleep(THUMBNAIL_SCAN_INTERVAL)
+
+def thumbnail_folders():
+    """Folders to watch: configured ones, else the server's download folders"""
+    if settings['thumbnailFolders']:
+        return settings['thumbnailFolders']
+    if os.environ.get('DOWNLOAD_PATH'):
+        return [os.environ['DOWNLOAD_PATH']]
+    downloads = os.path.join(os.path.expanduser('~'), 'Downloads')
+    return [os.path.join(downloads, 'Instagram'), os.path.join(downloads, 'TikTok')]
+
+def start_thumbnail_pipeline():
+    """Start background thumbnail generation if enabled"""
+    global thumbnail_pipeline
+    if not settings['thumbnails']:
+        return
+    thumbnail_pipeline = ThumbnailPipeline(thumbnail_folders(), settings['thumbnailSize'])
+    thumbnail_pipeline.start()
+
+def start_on_demand_proxy():
+    """Start on-demand mode with the configured idle timeout"""
+    global on_demand_proxy
+    on_demand_proxy = OnDemandProxy(settings['idleTimeoutMinutes'] * 60)
+    on_demand_proxy.start()
+
+def parse_command_line(argv):
+    """Command for this launch: show (default), start, stop or enqueue URLs"""
+    parser = argparse.ArgumentParser(description='Media Downloader Server launcher')
+    parser.add_argument('urls', nargs='*', help='Instagram/TikTok URLs to download')
+    parser.add_argument('--urls-file', help='Text file with one URL per line')
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument('--start', action='store_true', help='Start the server')
+    action.add_argument('--stop', action='store_true', help='Stop the server')
+    args = parser.parse_args(argv)
+
+    urls = list(args.urls)
+    if args.urls_file:
+        try:
+            with open(args.urls_file, encoding='utf-8') as f:
+                urls += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        except OSError as e:
+            parser.error(f'cannot read --urls-file: {e}')
+
+    if urls:
+        return {'op': 'enqueue', 'urls': urls}
+    if args.start:
+        return {'op': 'start'}
+    if args.stop:
+        return {'op': 'stop'}
+    return {'op': 'show'}
+
+def forward_command(command):
+    """Hand the command to a running instance; False if there is none"""
+    try:
+        with open(INSTANCE_PATH) as f:
+            instance = json.load(f)
+        address = instance['address']
+        if address.startswith('tcp://'):
+            host, port = address[len('tcp://'):].rsplit(':', 1)
+            sock = socket.create_connection((host, int(port)), timeout=2)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(2)
+            sock.connect(address)
+        with sock:
+            sock.sendall((json.dumps({**command, 'token': instance['token']}) + '\n').encode('utf-8'))
+            response = json.loads(sock.makefile('rb').readline())
+    except (OSError, ValueError, KeyError):
+        return False
+
+    if not response.get('ok'):
+        print(f"[Single Instance] Running launcher rejected command: {response.get('error')}")
+    return True
+
+def handle_command(command):
+    """Run a command from another launch (or from this launch's own arguments)"""
+    op = command.get('op')
+
+    if op == 'show':
+        on_show(None, None)
+    elif op == 'start':
+        if not server_is_up():
+            run_js('startServer()')
+    elif op == 'stop':
+        if server_is_up():
+            run_js('stopServer()')
+    elif op == 'enqueue':
+        urls = [u for u in command.get('urls', []) if isinstance(u, str)]
+        for url in urls:
+            url_queue.put(url)
+        notify(f'{len(urls)} URL masuk antrean download', 'success')
+    else:
+        return {'ok': False, 'error': f'Unknown op: {op}'}
+
+    return {'ok': True}
+
+def run_js(script):
+    """Run a function of the launcher UI (same path as clicking its button)"""
+    if window:
+        try:
+            window.evaluate_js(script)
+        except Exception as e:
+            print(f"[UI] {script} failed: {e}")
+
+def notify(message, kind='success'):
+    """Show a toast in the launcher window"""
+    print(f"[Queue] {message}")
+    run_js(f'showToast({json.dumps(message)}, {json.dumps(kind)})')
+
+def platform_for_url(url):
+    """Server platform for a post URL, or None"""
+    host = urllib.parse.urlparse(url).hostname or ''
+    for domain, platform in URL_PLATFORMS.items():
+        if host == domain or host.endswith('.' + domain):
+            return platform
+    return None
+
+def wait_for_server(timeout=60):
+    """Start the server if needed and wait until it accepts connections
+    (in on-demand mode the proxy starts server.js with the first request)"""
+    if server_is_up():
+        return True
+    run_js('startServer()')
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server_is_up():
+            return True
+        time.sleep(0.5)
+    return False
+
+def download_url(url):
+    """Extract media from one post URL and hand it to the server's batch download"""
+    platform = platform_for_url(url)
+    if not platform:
+        return False, 'URL bukan Instagram/TikTok'
+
+    result = api_request('POST', f'/api/{platform}/download', {'url': url}, timeout=300)
+    if not result.get('success'):
+        return False, result.get('error') or 'Gagal mengambil media'
+
+    username = result.get('username') or 'unknown'
+    timestamp = int(time.time() * 1000)
+    items = []
+    save_errors = []
+    for index, media in enumerate(result.get('media', [])):
+        ext = {'video': 'mp4', 'audio': 'mp3'}.get(media.get('type'), 'jpg')
+        filename = f"{username}_{timestamp}_{index + 1}.{ext}"
+        if media.get('hasCapturedBuffer') and media.get('filename'):
+            # TikTok buffer captured by the scraper - saved from server memory
+            saved = api_request('POST', '/api/tiktok/save-captured', {'filename': media['filename'], 'username': username})
+            if not saved.get('success'):
+                save_errors.append(saved.get('error') or 'Gagal menyimpan file')
+        else:
+            items.append({'url': media['url'], 'filename': filename, 'type': media.get('type')})
+
+    if items:
+        batch = api_request('POST', f'/api/{platform}/batch-save', {'items': items, 'username': username}, timeout=30)
+        if not batch.get('success'):
+            return False, batch.get('error') or 'Gagal memulai download'
+
+    if save_errors:
+        return False, f'{username}: {len(save_errors)} file gagal disimpan ({save_errors[0]})'
+
+    return True, f'{username}: {len(result.get("media", []))} file'
+
+def process_url_queue():
+    """Worker thread for URLs enqueued from the command line"""
+    while True:
+        url = url_queue.get()
+        if not wait_for_server():
+            notify('Server tidak bisa dijalankan - URL dilewati', 'error')
+            continue
+        ok, message = download_url(url)
+        notify(message if ok else f'Gagal: {message}', 'success' if ok else 'error')
+
 # Global references
 window = None
 tray_icon = None
+rate_coordinator = None
+node_version = None
+startup_stats = {}
+settings = load_settings()
+on_demand_proxy = None
+command_server = None
+thumbnail_pipeline = None
+server_process = None
+url_queue = queue.Queue()
 auto_restart_enabled = True
 server_should_run = False
 restart_count = 0
@@ -773,11 +2226,12 @@ def on_exit(icon, item):
     """Exit the application and stop server"""
     global window, tray_icon
     
-    subprocess.run(
-        'taskkill /F /IM node.exe',
-        shell=True,
-        creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-    )
+    if on_demand_proxy:
+        on_demand_proxy.stop()
+    if thumbnail_pipeline:
+        thumbnail_pipeline.stop()
+    
+    stop_server_process()
     
     if tray_icon:
         tray_icon.stop()
@@ -813,23 +2267,15 @@ def on_closing():
 
 def monitor_server():
     """Background thread to monitor server and auto-restart if crashed"""
-    global server_should_run, auto_restart_enabled, restart_count
+    global server_should_run, auto_restart_enabled, restart_count, server_process
     
     while True:
         time.sleep(3)
         
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex(('127.0.0.1', 3000))
-            sock.close()
-            is_running = (result == 0)
-        except:
-            is_running = False
-        
+        is_running = server_is_up()
         update_tray_icon(is_running)
         
-        if not server_should_run:
+        if not server_should_run or on_demand_proxy:
             restart_count = 0
             continue
             
@@ -841,19 +2287,7 @@ def monitor_server():
                 restart_count += 1
                 print(f"[Auto-Restart] Server crashed! Restarting... (attempt {restart_count}/{max_restart_attempts})")
                 
-                # Use bundled or system Node.js
-                bundled_node = os.path.join(BASE_DIR, 'nodejs', 'node.exe')
-                if os.path.exists(bundled_node):
-                    cmd_args = [bundled_node, 'server.js']
-                else:
-                    cmd_args = ['node', 'server.js']
-                
-                subprocess.Popen(
-                    cmd_args,
-                    shell=False,
-                    cwd=BASE_DIR,
-                    creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-                )
+                server_process = spawn_server()
                 time.sleep(3)
             else:
                 print(f"[Auto-Restart] Max restart attempts reached ({max_restart_attempts}). Giving up.")
@@ -862,15 +2296,48 @@ def monitor_server():
             restart_count = 0
 
 def main():
-    global window
+    global window, rate_coordinator, command_server, webview
+    command = parse_command_line(sys.argv[1:])
+
+    # Already running: hand over the command and exit before loading any GUI
+    if forward_command(command):
+        return
+
+    lock = InstanceLock(LOCK_PATH)
+    if not lock.acquire():
+        # Another launch holds the lock but is still opening its channel
+        for _ in range(50):
+            time.sleep(0.1)
+            if forward_command(command):
+                return
+        print("[Single Instance] Another launcher is running but not responding")
+        sys.exit(1)
+
+    import webview as webview_module
+    webview = webview_module
+
     api = Api()
+
+    command_server = CommandServer(handle_command)
+    try:
+        command_server.start()
+    except OSError as e:
+        print(f"[Single Instance] Failed to open command channel: {e}")
+    
+    # Shared rate budget for all server processes
+    rate_coordinator = RateCoordinator()
+    try:
+        rate_coordinator.start()
+    except OSError as e:
+        print(f"[Rate Coordinator] Failed to start: {e}")
+        rate_coordinator = None
     
     window = webview.create_window(
         'Media Downloader Server',
         html=HTML,
         js_api=api,
         width=480,
-        height=520,
+        height=580,
         resizable=False,
         frameless=True,
         easy_drag=True,
@@ -880,6 +2347,10 @@ def main():
     
     window.events.closing += on_closing
     
+    # This launch's own command (show is the default window behaviour)
+    if command['op'] != 'show':
+        window.events.loaded += lambda: handle_command(command)
+    
     def start_background_services():
         global Image, ImageDraw, pystray, item
         
@@ -900,7 +2371,13 @@ def main():
     monitor_thread = threading.Thread(target=monitor_server, daemon=True)
     monitor_thread.start()
     
+    threading.Thread(target=process_url_queue, daemon=True).start()
+    
+    start_thumbnail_pipeline()
+    
     webview.start()
 
 if __name__ == '__main__':
+    # Thumbnail worker processes re-launch the frozen exe
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,63 @@
+"""On-demand proxy: status checks and stop() must never start server.js"""
+
+import os
+import socket
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server_launcher
+
+
+class FakeProcess:
+    def poll(self):
+        return None
+
+
+class OnDemandProxyTest(unittest.TestCase):
+    def setUp(self):
+        self.spawned = []
+        port = server_launcher.find_free_port()
+        patches = [
+            mock.patch.object(server_launcher, 'SERVER_PORT', port),
+            mock.patch.object(server_launcher, 'spawn_server', self.fake_spawn),
+            mock.patch.object(server_launcher, 'kill_process_tree', lambda process: None),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.port = port
+        self.proxy = server_launcher.OnDemandProxy(idle_timeout=60)
+        self.proxy.start()
+        self.addCleanup(self.proxy.stop)
+        proxy_patch = mock.patch.object(server_launcher, 'on_demand_proxy', self.proxy)
+        proxy_patch.start()
+        self.addCleanup(proxy_patch.stop)
+
+    def fake_spawn(self, port=None):
+        self.spawned.append(port)
+        return FakeProcess()
+
+    def test_status_polling_does_not_spawn_backend(self):
+        api = server_launcher.Api()
+        for _ in range(5):
+            self.assertTrue(api.check_status())
+        self.assertTrue(server_launcher.wait_for_server(timeout=1))
+        time.sleep(0.2)
+        self.assertEqual(self.spawned, [])
+
+    def test_connection_after_stop_does_not_spawn_backend(self):
+        self.proxy.stop()
+        self.assertFalse(self.proxy.accept_thread.is_alive())
+        with self.assertRaises(OSError):
+            socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+        time.sleep(0.2)
+        self.assertEqual(self.spawned, [])
+
+
+if __name__ == '__main__':
+    unittest.main()